@@ -0,0 +1,81 @@
+"""
+Potential-savings matching benchmark: wasted compute resources against detailed-export
+resource_costs rows, the old per-resource linear scan vs billing._ResourceCostIndex.
+
+Rows are synthetic but shaped like the export: full resource names, bare names, numeric
+ids and empty keys. Both matchers are checked to agree before timing. Imports the worker
+modules, so run it with the worker's Python (Pyodide, as for decode_bench.py), from worker/:
+
+    python bench/billing_bench.py [rows] [wasted resources]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from providers.gcp.billing import _ResourceCostIndex  # noqa: E402
+
+
+def linear_match(rid: str, name: str, resource_costs: list[dict]) -> float:
+    """The matcher _ResourceCostIndex replaced: one pass over every row per resource."""
+    total = 0.0
+    rid = (rid or "").strip()
+    name = (name or "").strip()
+    for rc in resource_costs:
+        key = (rc.get("resource_key") or "").strip()
+        if not key:
+            continue
+        if key == rid or key == name:
+            total += rc.get("cost", 0)
+        elif rid and key.endswith("/" + rid):
+            total += rc.get("cost", 0)
+        elif name and key.endswith("/" + name):
+            total += rc.get("cost", 0)
+    return total
+
+
+def synthetic(rows: int, resources: int, seed: int = 7) -> tuple[list[dict], list[dict]]:
+    rng = random.Random(seed)
+    names = [f"vm-{i}" for i in range(max(resources * 10, 1000))]
+    costs = []
+    for _ in range(rows):
+        i = rng.randrange(len(names))
+        kind = rng.random()
+        if kind < 0.1:
+            key = names[i]
+        elif kind < 0.8:
+            key = f"//compute.googleapis.com/projects/p/zones/us-central1-a/instances/{names[i]}"
+        elif kind < 0.9:
+            key = str(10**6 + i)
+        else:
+            key = ""
+        costs.append({"resource_key": key, "service": "Compute Engine", "cost": round(rng.random() * 10, 4)})
+    step = len(names) // resources
+    wasted = [{"id": str(10**6 + i), "name": names[i]} for i in range(0, step * resources, step)]
+    return costs, wasted
+
+
+def main(rows: int, resources: int) -> None:
+    costs, wasted = synthetic(rows, resources)
+
+    start = time.perf_counter()
+    linear = [linear_match(r["id"], r["name"], costs) for r in wasted]
+    linear_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    index = _ResourceCostIndex(costs)
+    build_ms = (time.perf_counter() - start) * 1000
+    indexed = [index.match(r["id"], r["name"]) for r in wasted]
+    indexed_ms = (time.perf_counter() - start) * 1000
+
+    assert all(abs(a - b) < 1e-6 for a, b in zip(linear, indexed)), "matchers disagree"
+    print(f"{rows} rows x {resources} wasted resources")
+    print(f"  linear scan:  {linear_ms:9.1f} ms")
+    print(f"  cost index:   {indexed_ms:9.1f} ms (build {build_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*(args + [100_000, 200][len(args):]))
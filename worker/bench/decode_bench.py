@@ -0,0 +1,99 @@
+"""
+Decode benchmark for large GCP responses (fetch_gcp_api's two paths), on a synthetic
+Monitoring timeSeries.list body shaped like a recorded one.
+
+Compares, per body size:
+- bytes:    arrayBuffer → json.loads (the small-body path)
+- js+to_py: resp.json() → to_py() of the whole timeSeries array (the old large-body path)
+- js lazy:  helpers._decode_js → items converted one at a time as they are read
+
+Each run reads every point, like monitoring._fetch_series does. Needs Pyodide (the js
+module and a JS Response), e.g. the python of a `pyodide venv`, from worker/:
+
+    python bench/decode_bench.py [series ...]
+
+Pyodide on Node has a normal clock; on deployed Workers perf_counter only advances
+across I/O, so these numbers cannot be reproduced there.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import js  # noqa: E402
+
+from providers.gcp.helpers import _decode_bytes, _decode_js  # noqa: E402
+
+POINTS_PER_SERIES = 720  # 30 days of hourly points
+
+
+def synthetic_body(series: int) -> str:
+    """timeSeries.list body: gce_instance CPU utilization, one hourly point per hour."""
+    start = 1_700_000_000
+    return json.dumps({"timeSeries": [
+        {
+            "metric": {"type": "compute.googleapis.com/instance/cpu/utilization", "labels": {"instance_name": f"vm-{i}"}},
+            "resource": {"type": "gce_instance", "labels": {"instance_id": str(10**12 + i), "zone": "us-central1-a"}},
+            "metricKind": "GAUGE",
+            "valueType": "DOUBLE",
+            "points": [
+                {
+                    "interval": {"startTime": f"{start + h * 3600}", "endTime": f"{start + (h + 1) * 3600}"},
+                    "value": {"doubleValue": ((i * 7919 + h * 104729) % 1000) / 1000},
+                }
+                for h in range(POINTS_PER_SERIES)
+            ],
+        }
+        for i in range(series)
+    ]})
+
+
+def consume(time_series) -> int:
+    count = 0
+    for ts in time_series:
+        for point in ts.get("points", []):
+            point["value"].get("doubleValue")
+            count += 1
+    return count
+
+
+async def decode_bytes(body: str):
+    data, _ = await _decode_bytes(js.Response.new(body))
+    return data.get("timeSeries", [])
+
+
+async def decode_js_full(body: str):
+    obj = await js.Response.new(body).json()
+    return obj.timeSeries.to_py()
+
+
+async def decode_js_lazy(body: str):
+    return (await _decode_js(js.Response.new(body), ("timeSeries",))).get("timeSeries", [])
+
+
+async def measure(decode, body: str) -> tuple[float, float]:
+    """(ms to decode and read every point, peak Python allocation in MiB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    consume(await decode(body))
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+async def main(sizes: list[int]) -> None:
+    print(f"{'series':>7} {'body MiB':>9} {'path':<10} {'ms':>9} {'peak MiB':>9}")
+    for series in sizes:
+        body = synthetic_body(series)
+        for label, decode in (("bytes", decode_bytes), ("js+to_py", decode_js_full), ("js lazy", decode_js_lazy)):
+            ms, peak = await measure(decode, body)
+            print(f"{series:>7} {len(body) / 2**20:>9.1f} {label:<10} {ms:>9.1f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(a) for a in sys.argv[1:]] or [50, 200, 500]))
@@ -10,6 +10,7 @@ OPENAPI_SPEC = {
         {"name": "Connect", "description": "Provider credential management"},
         {"name": "Providers", "description": "Cloud provider data endpoints"},
         {"name": "Demo", "description": "Try-it-out endpoints — no authentication required"},
+        {"name": "Admin", "description": "Operational endpoints — require X-Admin-Token"},
     ],
     "paths": {
         "/api/v1/health": {
@@ -22,6 +23,23 @@ OPENAPI_SPEC = {
                 },
             }
         },
+        "/api/v1/_stats": {
+            "get": {
+                "tags": ["Admin"],
+                "summary": "Operational stats",
+                "description": (
+                    "Per-isolate counters since cold start: request latency histograms per route, "
+                    "span latency histograms and bytes per upstream API (unsized: responses of unknown size), cache hit/miss rates, "
+                    "token mints and error / event counters."
+                ),
+                "operationId": "stats",
+                "security": [{"AdminToken": []}],
+                "responses": {
+                    "200": {"description": "Stats snapshot"},
+                    "401": {"description": "Missing or invalid admin token", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/Error"}}}},
+                },
+            }
+        },
         "/api/v1/connect": {
             "post": {
                 "tags": ["Connect"],
@@ -190,7 +208,7 @@ OPENAPI_SPEC = {
             "get": {
                 "tags": ["Providers"],
                 "summary": "Get resource metrics",
-                "description": "Return CPU / RAM time-series for compute resources (e.g. GCE VMs). Optional query: days=30 (default) or 1–30.",
+                "description": "Return CPU / RAM time-series for compute resources (e.g. GCE VMs). Optional query: days=30 (default) or 1–180; windows over 30 days are fetched in concurrent 30-day chunks, older chunks at 6-hour alignment.",
                 "operationId": "getMetrics",
                 "parameters": [
                     {
@@ -203,8 +221,36 @@ OPENAPI_SPEC = {
                         "name": "days",
                         "in": "query",
                         "required": False,
-                        "schema": {"type": "integer", "minimum": 1, "maximum": 30, "default": 30},
-                        "description": "Number of days of metrics to return (1–30).",
+                        "schema": {"type": "integer", "minimum": 1, "maximum": 180, "default": 30},
+                        "description": "Number of days of metrics to return (1–180).",
+                    },
+                    {
+                        "name": "resolution",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string", "pattern": "^(full|summary|chart:[0-9]+)$", "default": "full"},
+                        "description": "full: hourly points. chart:N: at most N points per series (10–2000), coarser upstream alignment plus LTTB downsampling. summary: avg, peak and p50/p95/p99 CPU and RAM per series (empty metrics array); peak is aligned server-side over the whole window; avg and percentiles come from a quantile sketch of 6-hour means (of the hourly means when the metrics store is configured).",
+                    },
+                    {
+                        "name": "gke_level",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string", "enum": ["container", "workload", "namespace", "cluster"], "default": "container"},
+                        "description": "Aggregation level for GKE series; anything above container is reduced server-side by Cloud Monitoring.",
+                    },
+                    {
+                        "name": "run_level",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string", "enum": ["revision", "service"], "default": "revision"},
+                        "description": "Aggregation level for Cloud Run series; service merges all revisions server-side.",
+                    },
+                    {
+                        "name": "ids",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string"},
+                        "description": "Comma-separated resource ids to fetch (VM instance ids, Cloud Run service names, Cloud SQL database ids, GKE cluster names); only matching series are queried.",
                     },
                 ],
                 "security": [{"BearerAuth": []}],
@@ -225,11 +271,18 @@ OPENAPI_SPEC = {
             "get": {
                 "tags": ["Providers"],
                 "summary": "Dashboard overview",
-                "description": "Dashboard payload: summary, summary_cards (for top row), highlights (waste + utilization alerts), compute, metrics (avg/peak CPU/RAM, utilization_status), billing. Optional query: days=30 (default) or 1–30.",
+                "description": "Dashboard payload: summary, summary_cards (for top row), highlights (waste + utilization alerts), compute, metrics (avg/peak and p50/p95/p99 CPU/RAM, utilization_status from p95, else avg; summary resolution with GKE per workload and Cloud Run per service, so no per-point series), billing. Wasted resources and their highlights carry estimated_savings (monthly). Optional query: days=30 (default) or 1–180.",
                 "operationId": "getOverview",
                 "parameters": [
                     {"name": "provider", "in": "path", "required": True, "schema": {"type": "string", "enum": ["gcp", "aws", "azure", "k8s"]}},
-                    {"name": "days", "in": "query", "required": False, "schema": {"type": "integer", "minimum": 1, "maximum": 30, "default": 30}},
+                    {"name": "days", "in": "query", "required": False, "schema": {"type": "integer", "minimum": 1, "maximum": 180, "default": 30}},
+                    {
+                        "name": "detection",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string", "enum": ["scanners", "recommender", "both"], "default": "scanners"},
+                        "description": "Waste source. scanners: inventory rules plus Cloud Monitoring utilization. recommender: GCP Recommender API idle VM / disk / IP and machine-type findings, no Monitoring pulls (metrics is empty). both: merged, one finding per resource (scanners win).",
+                    },
                 ],
                 "security": [{"BearerAuth": []}],
                 "responses": {
@@ -284,7 +337,7 @@ OPENAPI_SPEC = {
             "get": {
                 "tags": ["Providers"],
                 "summary": "Get billing data",
-                "description": "Return project billing account info (enabled, account id, display name, currency). top_services and anomalies require BigQuery billing export.",
+                "description": "Return project billing account info (enabled, account id, display name, currency). top_services and anomalies require BigQuery billing export. With ?projects=, returns {projects: {id: report}} from one grouped BigQuery query per billing account.",
                 "operationId": "getBilling",
                 "parameters": [
                     {
@@ -292,7 +345,14 @@ OPENAPI_SPEC = {
                         "in": "path",
                         "required": True,
                         "schema": {"type": "string", "enum": ["gcp", "aws", "azure", "k8s"]},
-                    }
+                    },
+                    {
+                        "name": "projects",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string"},
+                        "description": "Comma-separated project ids (at most 25) for a multi-project view (no potential_savings).",
+                    },
                 ],
                 "security": [{"BearerAuth": []}],
                 "responses": {
@@ -304,6 +364,7 @@ OPENAPI_SPEC = {
                             }
                         },
                     },
+                    "400": {"description": "More than 25 projects in ?projects=", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/Error"}}}},
                     "401": {"description": "Missing or invalid Authorization header", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/Error"}}}},
                 },
             }
@@ -316,7 +377,13 @@ OPENAPI_SPEC = {
                 "scheme": "bearer",
                 "bearerFormat": "connectionId",
                 "description": "The connectionId returned from POST /api/v1/connect",
-            }
+            },
+            "AdminToken": {
+                "type": "apiKey",
+                "in": "header",
+                "name": "X-Admin-Token",
+                "description": "Matches the ADMIN_TOKEN worker secret",
+            },
         },
         "schemas": {
             "ConnectRequest": {
@@ -389,8 +456,9 @@ OPENAPI_SPEC = {
                     "billing_account_display_name": {"type": "string", "nullable": True},
                     "currency_code": {"type": "string"},
                     "top_services": {"type": "array", "items": {"type": "object"}, "description": "Requires BigQuery billing export"},
-                    "month_over_month_delta": {"type": "number", "nullable": True},
-                    "anomalies": {"type": "array", "items": {"type": "object"}},
+                    "month_over_month_delta": {"type": "number", "nullable": True, "description": "% change of the last 30 days' cost over the 30 days before. Requires BigQuery billing export"},
+                    "anomalies": {"type": "array", "items": {"type": "object"}, "description": "Service-days at least 3 standard deviations above the service's trailing 28-day mean: {service, date, cost, expected, z_score}. Requires BigQuery billing export"},
+                    "potential_savings": {"type": "object", "nullable": True, "description": "{value, currency, by_resource} monthly savings from wasted resources, from the detailed BigQuery export; in the overview, estimated from an embedded list-price table (source: price_table) when there is no export"},
                 },
             },
         }
@@ -1,25 +1,132 @@
+import sys
+import time
+
+_IMPORT_START = time.perf_counter()
+_IMPORT_MODULES = len(sys.modules)
+
+import json
 from urllib.parse import parse_qs, urlparse
 from workers import Response, Request
-from routes import health, docs, openapi_json, connect, chat, demo_overview, demo_projects
-from services import CredentialService
-from providers import get_provider
-from utils import error
+import routes
+from utils import error, RequestTimer, STATS
+from utils.stats import write_analytics
+from utils.profiler import profile_settings, run_profiled, log_profile, profile_header
+
+# Route modules, the GCP provider and the OpenAPI spec are imported on first use
+# (see routes/__init__.py); this is what every cold start pays up front.
+# On deployed Workers perf_counter only advances across I/O and importing does none,
+# so IMPORT_MS can read ~0 there (it is meaningful under `wrangler dev` only if that
+# runtime does not freeze the clock). IMPORT_MODULES, the number of modules loaded,
+# is the deterministic figure to compare between deploys.
+IMPORT_MS = (time.perf_counter() - _IMPORT_START) * 1000
+IMPORT_MODULES = len(sys.modules) - _IMPORT_MODULES
+COLD_START_BUDGET_MS = 150
+_cold = True
 
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
     "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Admin-Token, X-Profile",
+    "Timing-Allow-Origin": "*",
+    "Access-Control-Expose-Headers": "X-Profile",
 }
 
 
-def with_cors(response: Response) -> Response:
+def with_headers(response: Response, extra: dict) -> Response:
     headers = dict(response.headers) if response.headers else {}
-    headers.update(CORS_HEADERS)
+    headers.update(extra)
     return Response(response.body, status=response.status, headers=headers)
 
 
-async def on_fetch(request: Request, env) -> Response:
+def with_cors(response: Response) -> Response:
+    return with_headers(response, CORS_HEADERS)
+
+
+async def on_fetch(request: Request, env, ctx=None) -> Response:
+    """Time every request: Server-Timing header on the response + one structured log line."""
+    timer = RequestTimer.start(request.method, urlparse(request.url).path)
+    profile = profile_settings(env, request)
+    extra = {}
+    status = 500
+    try:
+        if profile:
+            top_n, expose = profile
+            response, rows = await run_profiled(route(request, env, ctx), top_n)
+            if rows:
+                log_profile(timer.method, timer.path, rows)
+            if rows and expose:
+                extra["X-Profile"] = profile_header(rows)
+        else:
+            response = await route(request, env, ctx)
+        status = response.status
+    finally:
+        timer.finish(status)
+        _report_cold_start(env, timer)
+        route_label = route_template(request.method, timer.path)
+        STATS.record_request(route_label, status, timer.total_ms)
+        write_analytics(env, route_label, status, timer)
+    return with_headers(response, {**extra, "Server-Timing": timer.server_timing()})
+
+
+def _report_cold_start(env, timer: RequestTimer) -> None:
+    """
+    On the isolate's first request, log import time + first-request latency against the budget.
+    first_request_ms includes the request's I/O, so it is the figure the budget really checks.
+    """
+    global _cold
+    if not _cold:
+        return
+    _cold = False
+    try:
+        budget = float(getattr(env, "COLD_START_BUDGET_MS", None) or COLD_START_BUDGET_MS)
+    except (TypeError, ValueError):
+        budget = COLD_START_BUDGET_MS
+    cold_ms = IMPORT_MS + timer.total_ms
+    STATS.incr("cold_starts")
+    if cold_ms > budget:
+        STATS.incr("cold_starts_over_budget")
+    print(json.dumps({
+        "event": "cold_start",
+        "path": timer.path,
+        "import_ms": round(IMPORT_MS, 1),
+        "import_modules": IMPORT_MODULES,
+        "first_request_ms": round(timer.total_ms, 1),
+        "budget_ms": budget,
+        "over_budget": cold_ms > budget,
+    }))
+
+
+# Stats / Analytics Engine label per request: one of these templates, never the raw path
+# (which any unauthenticated caller controls).
+STATIC_ROUTES = frozenset({
+    "/docs",
+    "/openapi.json",
+    "/api/v1/health",
+    "/api/v1/_stats",
+    "/api/v1/connect",
+    "/api/v1/chat",
+    "/api/v1/demo/projects",
+    "/api/v1/demo/overview",
+})
+PROVIDER_RESOURCES = ("projects", "compute", "metrics", "billing", "overview")
+# Each project in ?projects= costs a billingInfo lookup and widens the BigQuery scan.
+MAX_BILLING_PROJECTS = 25
+
+
+def route_template(method: str, path: str) -> str:
+    """Bounded route label: a static route, /api/v1/{provider}/<resource>, "OPTIONS" or "(other)"."""
+    if method == "OPTIONS":
+        return "OPTIONS"
+    if path in STATIC_ROUTES:
+        return path
+    parts = path.strip("/").split("/")
+    if len(parts) == 4 and parts[0] == "api" and parts[1] == "v1" and parts[3] in PROVIDER_RESOURCES:
+        return f"/api/v1/{{provider}}/{parts[3]}"
+    return "(other)"
+
+
+async def route(request: Request, env, ctx=None) -> Response:
     path = urlparse(request.url).path
     method = request.method
 
@@ -27,36 +134,42 @@ async def on_fetch(request: Request, env) -> Response:
         return Response(None, status=204, headers=CORS_HEADERS)
 
     if path == "/docs":
-        return await docs()
+        return await routes.docs()
 
     if path == "/openapi.json":
-        return with_cors(await openapi_json())
+        return with_cors(await routes.openapi_json(request))
 
     if path == "/api/v1/health":
-        return with_cors(await health())
+        return with_cors(await routes.health())
+
+    if path == "/api/v1/_stats" and method == "GET":
+        return with_cors(await routes.stats(env, request))
 
     if path == "/api/v1/connect" and method == "POST":
-        return with_cors(await connect(env, request))
+        return with_cors(await routes.connect(env, request))
 
     if path == "/api/v1/chat" and method == "POST":
-        return with_cors(await chat(env, request))
+        return with_cors(await routes.chat(env, request, ctx))
 
     if path == "/api/v1/demo/projects" and method == "GET":
-        return with_cors(await demo_projects())
+        return with_cors(await routes.demo_projects(request))
 
     if path == "/api/v1/demo/overview" and method == "GET":
-        return with_cors(await demo_overview(request))
+        return with_cors(await routes.demo_overview(request))
 
     # ── Provider routes: /api/v1/:provider/:resource ─────────────────
     parts = path.strip("/").split("/")  # ["api", "v1", "<provider>", "<resource>"]
     if len(parts) == 4 and parts[0] == "api" and parts[1] == "v1" and method == "GET":
-        return with_cors(await handle_provider_request(env, request, parts[2], parts[3]))
+        return with_cors(await handle_provider_request(env, request, parts[2], parts[3], ctx))
 
     return with_cors(Response("Not Found", status=404))
 
 
-async def handle_provider_request(env, request, provider_name: str, resource: str) -> Response:
+async def handle_provider_request(env, request, provider_name: str, resource: str, ctx=None) -> Response:
     """Resolve credentials, init the provider, call the right method."""
+    from services import CredentialService
+    from providers import get_provider
+
     creds = await CredentialService(env).resolve(request)
     if creds is None:
         return error("Missing or invalid Authorization header", 401)
@@ -64,11 +177,10 @@ async def handle_provider_request(env, request, provider_name: str, resource: st
     if creds.get("provider") != provider_name:
         return error(f"connectionId is for '{creds['provider']}', not '{provider_name}'", 400)
 
-    provider = get_provider(provider_name, creds["credentials"])
+    provider = get_provider(provider_name, creds["credentials"], env=env, ctx=ctx)
     if provider is None:
         return error(f"Unknown provider: {provider_name}", 400)
 
-    import json
     try:
         if resource == "projects":
             data = await provider.get_projects()
@@ -77,7 +189,11 @@ async def handle_provider_request(env, request, provider_name: str, resource: st
         elif resource == "metrics":
             data = await provider.get_metrics(request)
         elif resource == "billing":
-            data = await provider.get_billing()
+            query = parse_qs(urlparse(request.url).query)
+            project_ids = sorted({p.strip() for p in ",".join(query.get("projects", [])).split(",") if p.strip()})
+            if len(project_ids) > MAX_BILLING_PROJECTS:
+                return error(f"At most {MAX_BILLING_PROJECTS} projects per billing request", 400)
+            data = await provider.get_projects_billing(project_ids) if project_ids else await provider.get_billing()
         elif resource == "overview":
             query = parse_qs(urlparse(request.url).query)
             project_id = query.get("project", [None])[0] if query.get("project") else None
@@ -1,9 +1,14 @@
 from providers.base import CloudProvider
-from providers.gcp import GCPProvider
 
 
-def get_provider(provider_name: str, credentials: dict) -> CloudProvider | None:
-    """Return the right CloudProvider instance for a given provider name and credentials."""
+def get_provider(provider_name: str, credentials: dict, env=None, ctx=None) -> CloudProvider | None:
+    """
+    Return the right CloudProvider instance for a given provider name and credentials.
+    env (the Cloudflare env) gives providers access to optional bindings such as caches;
+    ctx (the request context) lets them finish cache refreshes after the response.
+    """
     if provider_name == "gcp":
-        return GCPProvider(credentials)
+        # Imported on first use: the GCP adapter pulls in every collector module.
+        from providers.gcp import GCPProvider
+        return GCPProvider(credentials, env=env, ctx=ctx)
     return None
@@ -5,7 +5,7 @@ class CloudProvider(ABC):
     """
     Abstract base class all cloud provider adapters must implement.
 
-    Every provider (GCP, AWS, Azure, K8s) implements these five methods
+    Every provider (GCP, AWS, Azure, K8s) implements these six methods
     and returns normalized dicts. The router never needs to know which
     provider it's talking to — it just calls these methods.
     """
@@ -30,6 +30,11 @@ class CloudProvider(ABC):
         """Return cost breakdown and spend anomalies."""
         ...
 
+    @abstractmethod
+    async def get_projects_billing(self, project_ids: list[str]) -> dict:
+        """Return get_billing for several projects at once: {"projects": {project_id: billing}}."""
+        ...
+
     @abstractmethod
     async def get_overview(self, request, project_id: str | None = None) -> dict:
         """Return single dashboard payload: compute, metrics (with utilization), billing, summary. project_id optionally scopes to that project (e.g. GCP)."""
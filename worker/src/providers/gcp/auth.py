@@ -4,6 +4,9 @@ import base64
 import time
 from pyodide.ffi import to_js
 
+from utils.stats import STATS
+from utils.timing import span
+
 
 class GCPAuthService:
     """
@@ -34,8 +37,10 @@ class GCPAuthService:
         Sign a JWT with the Service Account private key and exchange it
         for a GCP access token. Returns the bearer token string.
         """
-        jwt = await self._build_jwt()
-        return await self._exchange_jwt(jwt)
+        STATS.incr("token_mints")
+        with span("gcp-token"):
+            jwt = await self._build_jwt()
+            return await self._exchange_jwt(jwt)
 
     async def _build_jwt(self) -> str:
         """
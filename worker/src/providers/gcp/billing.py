@@ -3,16 +3,169 @@ GCP Cloud Billing API — project billing info, billing account details, and
 cost data from BigQuery billing export. When export is configured, returns
 top_services and potential_savings so the product can say "you can save X".
 """
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import quote
+
 from providers.gcp.helpers import fetch_gcp_api, fetch_gcp_api_post
+from utils.stats import STATS
 
 BILLING_BASE = "https://cloudbilling.googleapis.com/v1"
 BIGQUERY_BASE = "https://bigquery.googleapis.com/bigquery/v2"
 
+# BigQuery: server-side wait per jobs.query / getQueryResults call, rows per page, overall deadline.
+BQ_WAIT_MS = 10_000
+BQ_PAGE_ROWS = 10_000
+BQ_DEADLINE_S = 60
+# Only these keys of getQueryResults pages are read (lets large pages skip full conversion).
+BQ_RESULT_FIELDS = ("jobComplete", "rows", "pageToken")
+# Every query carries maximumBytesBilled (BigQuery fails it, unbilled, above the cap); rollup
+# backfills are dry-run first and skipped when the estimate is over the cap.
+BQ_MAX_BYTES_BILLED = 50 * 1024**3
 
-def _bq_table(project_id: str, dataset_id: str, billing_account_id: str, detailed: bool) -> str:
-    """BigQuery table name for billing export (dashes in billing id are kept)."""
+# BigQuery results cached in KV (CacheService) per billing account + export project. Cached
+# results are served immediately; once they are BILLING_RECHECK_S old, a background refresh
+# compares the export table's lastModifiedTime (the watermark) and re-queries only if it moved.
+BILLING_CACHE_PREFIX = "billing:v2"
+BILLING_RECHECK_S = 3600
+BILLING_CACHE_TTL_S = 7 * 86400
+
+# Trends: month_over_month_delta compares the last TREND_DAYS days with the TREND_DAYS before; a
+# service-day is an anomaly when it is ANOMALY_Z standard deviations (and ANOMALY_MIN_INCREASE in
+# cost) above the service's mean over the ANOMALY_LOOKBACK_DAYS before it, given at least
+# ANOMALY_BASELINE_DAYS days of history.
+TREND_DAYS = 30
+ANOMALY_LOOKBACK_DAYS = 28
+ANOMALY_BASELINE_DAYS = 7
+ANOMALY_Z = 3.0
+ANOMALY_MIN_INCREASE = 1.0
+MAX_ANOMALIES = 20
+
+# Daily cost rollups in the same KV: per-day service (and, for detailed export, resource) totals.
+# A refresh scans only the export partitions since the last rollup, re-rolling the last REROLL_DAYS
+# days (late export rows still change them), so the bytes scanned don't grow with the table.
+ROLLUP_PREFIX = "billing-rollup:v1"
+ROLLUP_DAYS = 30
+REROLL_DAYS = 3
+ROLLUP_TTL_S = (ROLLUP_DAYS + REROLL_DAYS) * 86400
+
+# Project → billing account and account → display name / currency almost never change: cached in
+# KV for BILLING_META_TTL_S and re-fetched in the background once BILLING_META_RECHECK_S old.
+BILLING_META_PREFIX = "billing-meta:v1"
+BILLING_META_RECHECK_S = 6 * 3600
+BILLING_META_TTL_S = 30 * 86400
+
+
+def _bq_table_id(billing_account_id: str, detailed: bool) -> str:
+    """Billing export table id (dashes in billing id are kept)."""
     suffix = "resource_v1" if detailed else "v1"
-    return f"`{project_id}.{dataset_id}.gcp_billing_export_{suffix}_{billing_account_id}`"
+    return f"gcp_billing_export_{suffix}_{billing_account_id}"
+
+
+def _bq_table(project_id: str, dataset_id: str, billing_account_id: str, detailed: bool) -> str:
+    """BigQuery table name for billing export, quoted for SQL."""
+    return f"`{project_id}.{dataset_id}.{_bq_table_id(billing_account_id, detailed)}`"
+
+
+async def _export_watermark(project_id: str, dataset_id: str, billing_account_id: str, token: str) -> int | None:
+    """lastModifiedTime (ms) of the standard export table; it moves whenever new export data lands."""
+    table_id = _bq_table_id(billing_account_id, detailed=False)
+    url = f"{BIGQUERY_BASE}/projects/{project_id}/datasets/{dataset_id}/tables/{table_id}?fields=lastModifiedTime"
+    try:
+        data = await fetch_gcp_api(url, token, "BigQuery")
+        return int(data.get("lastModifiedTime") or 0) or None
+    except Exception:
+        return None
+
+
+async def _query_pages(project_id: str, token: str, sql: str, params: list[dict]):
+    """
+    Run a BigQuery query and yield its result rows one page at a time.
+
+    jobs.query waits up to BQ_WAIT_MS; if the job is not complete by then, getQueryResults is
+    polled (each call also waits server-side up to BQ_WAIT_MS) until it is, then pageToken is
+    followed until the last page. Raises TimeoutError after BQ_DEADLINE_S.
+    """
+    deadline = time.monotonic() + BQ_DEADLINE_S
+    body = {
+        "query": sql,
+        "useLegacySql": False,
+        "parameterMode": "NAMED",
+        "queryParameters": params,
+        "timeoutMs": BQ_WAIT_MS,
+        "maxResults": BQ_PAGE_ROWS,
+        "maximumBytesBilled": str(BQ_MAX_BYTES_BILLED),
+    }
+    result = await fetch_gcp_api_post(f"{BIGQUERY_BASE}/projects/{project_id}/queries", token, body, "BigQuery")
+    job = result.get("jobReference") or {}
+    results_url = (
+        f"{BIGQUERY_BASE}/projects/{job.get('projectId', project_id)}/queries/{job.get('jobId', '')}"
+        f"?location={quote(job.get('location', ''))}&timeoutMs={BQ_WAIT_MS}&maxResults={BQ_PAGE_ROWS}"
+    )
+    while True:
+        if result.get("jobComplete", True):
+            yield result.get("rows") or []
+            page_token = result.get("pageToken")
+            if not page_token:
+                return
+            url = f"{results_url}&pageToken={quote(page_token)}"
+        else:
+            url = results_url
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"BigQuery job {job.get('jobId', '')} did not finish in {BQ_DEADLINE_S}s")
+        result = await fetch_gcp_api(url, token, "BigQuery", fields=BQ_RESULT_FIELDS)
+
+
+async def _dry_run_bytes(project_id: str, token: str, sql: str, params: list[dict]) -> int:
+    """Bytes the query would scan (jobs.query with dryRun: free, nothing runs)."""
+    body = {"query": sql, "useLegacySql": False, "parameterMode": "NAMED", "queryParameters": params, "dryRun": True}
+    result = await fetch_gcp_api_post(f"{BIGQUERY_BASE}/projects/{project_id}/queries", token, body, "BigQuery")
+    return int(result.get("totalBytesProcessed") or 0)
+
+
+async def _query_rows(project_id: str, token: str, sql: str, params: list[dict], parse) -> list:
+    """All rows of a query, each parsed with parse(fields) as its page arrives."""
+    out = []
+    async for rows in _query_pages(project_id, token, sql, params):
+        out.extend(parse(r.get("f") or []) for r in rows)
+    return out
+
+
+def _parse_top_service(f: list[dict]) -> tuple[str, dict]:
+    return f[0].get("v") or "", {
+        "service": f[1].get("v") if len(f) > 1 else "Unknown",
+        "cost": float(f[2].get("v", 0)) if len(f) > 2 else 0,
+    }
+
+
+def _parse_resource_cost(f: list[dict]) -> tuple[str, dict]:
+    return f[0].get("v") or "", {
+        "resource_key": (f[1].get("v") or "").strip(),
+        "service": f[2].get("v") or "",
+        "cost": float(f[3].get("v", 0)) if len(f) > 3 else 0,
+    }
+
+
+def _by_project(rows: list[tuple[str, dict]], project_ids: list[str]) -> dict[str, list[dict]]:
+    """Fan (project_id, row) pairs out into one list per requested project."""
+    out = {pid: [] for pid in project_ids}
+    for pid, row in rows:
+        if pid in out:
+            out[pid].append(row)
+    return out
+
+
+def _query_params(project_ids: list[str], **dates: str) -> list[dict]:
+    """@project_ids (ARRAY<STRING>) plus any DATE parameters."""
+    params = [{
+        "name": "project_ids",
+        "parameterType": {"type": "ARRAY", "arrayType": {"type": "STRING"}},
+        "parameterValue": {"arrayValues": [{"value": pid} for pid in project_ids]},
+    }]
+    for name, value in dates.items():
+        params.append({"name": name, "parameterType": {"type": "DATE"}, "parameterValue": {"value": value}})
+    return params
 
 
 async def _query_bigquery(
@@ -21,97 +174,443 @@ async def _query_bigquery(
     billing_account_id: str,
     token: str,
     detailed: bool,
-) -> tuple[list[dict], list[dict] | None]:
+    project_ids: list[str],
+) -> tuple[dict[str, tuple[list[dict], list[dict] | None]], bool]:
     """
-    Query BigQuery billing export for last 30 days. Returns (top_services, resource_costs).
-    resource_costs is None if standard-only export; else list of {resource_key, service, cost}.
+    Query BigQuery billing export (in project_id) for the last 30 days of project_ids, grouped by
+    project in one scan. Returns ({project: (top_services, resource_costs)}, failed); resource_costs
+    is None if standard-only export, else list of {resource_key, service, cost}. Both queries run
+    concurrently; a failed query yields [] / None without affecting the other, and sets failed.
     """
+    params = _query_params(project_ids)
     table = _bq_table(project_id, dataset_id, billing_account_id, detailed=False)
     # Top services from standard table (works for both standard and detailed export)
     sql_top = f"""
     SELECT
+      project.id AS project_id,
       COALESCE(service.description, 'Unknown') AS service,
       SUM(cost) AS cost
     FROM {table}
-    WHERE project.id = @project_id
+    WHERE project.id IN UNNEST(@project_ids)
       AND usage_start_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 30 DAY)
       AND (cost_type = 'regular' OR cost_type IS NULL)
-    GROUP BY 1
-    ORDER BY 2 DESC
-    LIMIT 15
+    GROUP BY 1, 2
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY project_id ORDER BY cost DESC) <= 15
     """
-    body = {
-        "query": sql_top,
-        "useLegacySql": False,
-        "parameterMode": "NAMED",
-        "queryParameters": [{"name": "project_id", "parameterType": {"type": "STRING"}, "parameterValue": {"value": project_id}}],
-    }
-    url = f"{BIGQUERY_BASE}/projects/{project_id}/queries"
-    try:
-        result = await fetch_gcp_api_post(url, token, body, "BigQuery")
-    except Exception:
-        return [], None
-
-    rows = result.get("rows") or []
-    top_services = []
-    for r in rows:
-        f = r.get("f") or []
-        top_services.append({"service": f[0].get("v") if len(f) > 0 else "Unknown", "cost": float(f[1].get("v", 0)) if len(f) > 1 else 0})
+    queries = [_query_rows(project_id, token, sql_top, params, _parse_top_service)]
 
-    resource_costs = None
     if detailed:
         table_res = _bq_table(project_id, dataset_id, billing_account_id, detailed=True)
         sql_res = f"""
         SELECT
+          project.id AS project_id,
           COALESCE(resource.name, resource.global_name, '') AS resource_key,
           COALESCE(service.description, '') AS service,
           SUM(cost) AS cost
         FROM {table_res}
-        WHERE project.id = @project_id
+        WHERE project.id IN UNNEST(@project_ids)
           AND usage_start_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 30 DAY)
           AND (cost_type = 'regular' OR cost_type IS NULL)
-        GROUP BY 1, 2
+        GROUP BY 1, 2, 3
         HAVING SUM(cost) > 0
         """
-        body_res = {
-            "query": sql_res,
-            "useLegacySql": False,
-            "parameterMode": "NAMED",
-            "queryParameters": [{"name": "project_id", "parameterType": {"type": "STRING"}, "parameterValue": {"value": project_id}}],
-        }
-        try:
-            res_result = await fetch_gcp_api_post(url, token, body_res, "BigQuery")
-            rrows = res_result.get("rows") or []
-            resource_costs = []
-            for r in rrows:
-                f = r.get("f") or []
-                resource_costs.append({
-                    "resource_key": (f[0].get("v") or "").strip(),
-                    "service": f[1].get("v") or "",
-                    "cost": float(f[2].get("v", 0)) if len(f) > 2 else 0,
-                })
-        except Exception:
-            pass
+        queries.append(_query_rows(project_id, token, sql_res, params, _parse_resource_cost))
+
+    results = await asyncio.gather(*queries, return_exceptions=True)
+    top_services = _by_project(results[0] if not isinstance(results[0], Exception) else [], project_ids)
+    resource_costs = {pid: None for pid in project_ids}
+    if detailed and not isinstance(results[1], Exception):
+        resource_costs = _by_project(results[1], project_ids)
+    return {
+        pid: (sorted(top_services[pid], key=lambda s: s["cost"], reverse=True), resource_costs[pid])
+        for pid in project_ids
+    }, any(isinstance(r, Exception) for r in results)
+
+
+def _rollup_sql(table: str, detailed: bool) -> str:
+    """
+    Per-day, per-project cost since @since. The _PARTITIONTIME predicate prunes the scan to
+    partitions exported since then (export time never precedes usage time, so no rows are missed).
+    """
+    columns = (
+        "COALESCE(resource.name, resource.global_name, '') AS resource_key,\n"
+        "      COALESCE(service.description, '') AS service,"
+        if detailed
+        else "COALESCE(service.description, 'Unknown') AS service,"
+    )
+    return f"""
+    SELECT
+      CAST(DATE(usage_start_time) AS STRING) AS day,
+      project.id AS project_id,
+      {columns}
+      SUM(cost) AS cost
+    FROM {table}
+    WHERE project.id IN UNNEST(@project_ids)
+      AND _PARTITIONTIME >= TIMESTAMP(@since)
+      AND usage_start_time >= TIMESTAMP(@since)
+      AND (cost_type = 'regular' OR cost_type IS NULL)
+    GROUP BY {"1, 2, 3, 4" if detailed else "1, 2, 3"}
+    """
+
+
+def _parse_rollup_row(f: list[dict]) -> tuple[str, list]:
+    """(project_id, [day, …group columns, cost]) as stored in the rollup."""
+    values = [c.get("v") or "" for c in f[:-1]]
+    return values[1], [values[0], *values[2:], float(f[-1].get("v") or 0)]
+
+
+async def _rollup_costs(
+    cache,
+    project_id: str,
+    dataset_id: str,
+    billing_account_id: str,
+    token: str,
+    detailed: bool,
+    project_ids: list[str],
+) -> tuple[dict[str, tuple[list[dict], list[dict] | None]], bool]:
+    """
+    _query_bigquery's result over the last ROLLUP_DAYS days, built from daily rollups in KV (one
+    per billed project). Only days since the oldest previous rollup (minus REROLL_DAYS) are
+    queried, for all projects in one grouped scan; the rest are read back. If a query fails or
+    a backfill's dry-run estimate is over the byte cap, the rollups are left as they were and
+    the stored days are used; failed is True when a query (or dry run) raised.
+    """
+    mode = "detailed" if detailed else "standard"
+    prefixes = {pid: f"{ROLLUP_PREFIX}:{billing_account_id}:{pid}:{mode}" for pid in project_ids}
+    today = datetime.now(timezone.utc).date()
+    window_start = (today - timedelta(days=ROLLUP_DAYS - 1)).isoformat()
+    metas = await asyncio.gather(*(cache.get(prefixes[pid], "billing-rollup") for pid in project_ids))
+    metas = {pid: meta or {} for pid, meta in zip(project_ids, metas)}
+    since = min(_rollup_since(meta, window_start) for meta in metas.values())
+
+    params = _query_params(project_ids, since=since)
+    sqls = [_rollup_sql(_bq_table(project_id, dataset_id, billing_account_id, detailed=False), detailed=False)]
+    if detailed:
+        sqls.append(_rollup_sql(_bq_table(project_id, dataset_id, billing_account_id, detailed=True), detailed=True))
+
+    fresh = None
+    failed = False
+    if (today - date.fromisoformat(since)).days >= REROLL_DAYS:
+        estimates = await asyncio.gather(*(_dry_run_bytes(project_id, token, sql, params) for sql in sqls), return_exceptions=True)
+        failed = any(isinstance(e, Exception) for e in estimates)
+        if failed or any(e > BQ_MAX_BYTES_BILLED for e in estimates):
+            if not failed:
+                STATS.incr("billing_rollup_over_budget")
+            sqls = []
+    if sqls:
+        results = await asyncio.gather(
+            *(_query_rows(project_id, token, sql, params, _parse_rollup_row) for sql in sqls), return_exceptions=True
+        )
+        failed = any(isinstance(r, Exception) for r in results)
+        if not failed:
+            fresh = [_by_project(rows, project_ids) for rows in results]
+
+    merged = await asyncio.gather(*(
+        _merge_rollup(
+            cache, prefixes[pid], metas[pid], since, window_start, today,
+            [rows[pid] for rows in fresh] if fresh is not None else None,
+            detailed,
+        )
+        for pid in project_ids
+    ))
+    return dict(zip(project_ids, merged)), failed
+
+
+def _rollup_since(meta: dict, window_start: str) -> str:
+    """First day a project's rollup needs (re)queried: the window start, or the last REROLL_DAYS."""
+    through = meta.get("through")
+    if not through:
+        return window_start
+    return max(window_start, (date.fromisoformat(through) - timedelta(days=REROLL_DAYS - 1)).isoformat())
+
+
+async def _merge_rollup(
+    cache, prefix: str, meta: dict, since: str, window_start: str, today: date, fresh: list | None, detailed: bool
+) -> tuple[list[dict], list[dict] | None]:
+    """Replace days >= since with fresh rows (if any), write the rollup back and total the window."""
+    services = {day: v for day, v in (meta.get("services") or {}).items() if day >= window_start}
+    resource_days = {day: None for day in meta.get("resource_days") or [] if day >= window_start}
+    if fresh is not None:
+        services = {day: v for day, v in services.items() if day < since}
+        resource_days = {day: v for day, v in resource_days.items() if day < since}
+        for day, service, cost in fresh[0]:
+            day_services = services.setdefault(day, {})
+            day_services[service] = day_services.get(service, 0.0) + cost
+        if detailed:
+            for day, resource_key, service, cost in fresh[1]:
+                resource_days.setdefault(day, []).append([resource_key, service, cost])
+            await asyncio.gather(*(
+                cache.put(f"{prefix}:{day}", {"rows": rows}, ttl=ROLLUP_TTL_S) for day, rows in resource_days.items() if rows is not None
+            ))
+        meta = {"through": today.isoformat(), "services": services, "resource_days": sorted(resource_days)}
+        await cache.put(prefix, meta, ttl=ROLLUP_TTL_S)
 
+    service_totals: dict[str, float] = {}
+    for day_services in services.values():
+        for service, cost in day_services.items():
+            service_totals[service] = service_totals.get(service, 0.0) + cost
+    top_services = [
+        {"service": service, "cost": cost}
+        for service, cost in sorted(service_totals.items(), key=lambda item: item[1], reverse=True)[:15]
+    ]
+    if not detailed:
+        return top_services, None
+
+    stored = [day for day, rows in resource_days.items() if rows is None]
+    for day, value in zip(stored, await asyncio.gather(*(cache.get(f"{prefix}:{day}", "billing-rollup") for day in stored))):
+        resource_days[day] = (value or {}).get("rows") or []
+    resource_totals: dict[tuple[str, str], float] = {}
+    for rows in resource_days.values():
+        for resource_key, service, cost in rows:
+            key = (resource_key.strip(), service)
+            resource_totals[key] = resource_totals.get(key, 0.0) + cost
+    resource_costs = [
+        {"resource_key": resource_key, "service": service, "cost": cost}
+        for (resource_key, service), cost in resource_totals.items()
+        if cost > 0
+    ]
     return top_services, resource_costs
 
 
-def _match_resource_cost(rid: str, name: str, resource_costs: list[dict]) -> float:
-    """Sum cost from resource_costs rows whose resource_key matches this compute resource (id or name)."""
-    total = 0.0
-    rid = (rid or "").strip()
-    name = (name or "").strip()
-    for rc in resource_costs:
-        key = (rc.get("resource_key") or "").strip()
-        if not key:
+def _trends_sql(table: str) -> str:
+    """
+    Daily cost per project and service over the last 2 × TREND_DAYS days, scored in one pass:
+    per-project totals for the current and previous TREND_DAYS, and per service-day a z-score
+    against the service's trailing ANOMALY_LOOKBACK_DAYS. Returns the anomalous service-days
+    plus one row per project (rn = 1) so projects without anomalies still get their totals.
+    """
+    return f"""
+    WITH daily AS (
+      SELECT
+        project.id AS project_id,
+        COALESCE(service.description, 'Unknown') AS service,
+        DATE(usage_start_time) AS day,
+        SUM(cost) AS cost
+      FROM {table}
+      WHERE project.id IN UNNEST(@project_ids)
+        AND _PARTITIONTIME >= TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL {2 * TREND_DAYS} DAY))
+        AND usage_start_time >= TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL {2 * TREND_DAYS - 1} DAY))
+        AND (cost_type = 'regular' OR cost_type IS NULL)
+      GROUP BY 1, 2, 3
+    ),
+    scored AS (
+      SELECT
+        *,
+        SUM(IF(day > DATE_SUB(CURRENT_DATE(), INTERVAL {TREND_DAYS} DAY), cost, 0)) OVER by_project AS current_cost,
+        SUM(IF(day <= DATE_SUB(CURRENT_DATE(), INTERVAL {TREND_DAYS} DAY), cost, 0)) OVER by_project AS previous_cost,
+        AVG(cost) OVER trailing AS baseline,
+        STDDEV_SAMP(cost) OVER trailing AS spread,
+        COUNT(*) OVER trailing AS baseline_days,
+        ROW_NUMBER() OVER (PARTITION BY project_id ORDER BY day DESC, service) AS rn
+      FROM daily
+      WINDOW
+        by_project AS (PARTITION BY project_id),
+        trailing AS (
+          PARTITION BY project_id, service ORDER BY UNIX_DATE(day)
+          RANGE BETWEEN {ANOMALY_LOOKBACK_DAYS} PRECEDING AND 1 PRECEDING
+        )
+    )
+    SELECT * FROM (
+      SELECT
+        project_id,
+        service,
+        CAST(day AS STRING) AS day,
+        cost,
+        baseline,
+        SAFE_DIVIDE(cost - baseline, spread) AS z_score,
+        current_cost,
+        previous_cost,
+        COALESCE(
+          day > DATE_SUB(CURRENT_DATE(), INTERVAL {TREND_DAYS} DAY)
+          AND baseline_days >= {ANOMALY_BASELINE_DAYS}
+          AND cost - baseline >= {ANOMALY_MIN_INCREASE}
+          AND SAFE_DIVIDE(cost - baseline, spread) >= {ANOMALY_Z},
+          FALSE
+        ) AS is_anomaly,
+        rn
+      FROM scored
+    )
+    WHERE is_anomaly OR rn = 1
+    """
+
+
+def _parse_trend_row(f: list[dict]) -> tuple[str, dict]:
+    v = [c.get("v") for c in f]
+    return v[0] or "", {
+        "service": v[1] or "Unknown",
+        "date": v[2],
+        "cost": float(v[3] or 0),
+        "expected": float(v[4] or 0),
+        "z_score": float(v[5]) if v[5] is not None else None,
+        "current": float(v[6] or 0),
+        "previous": float(v[7] or 0),
+        "anomaly": v[8] == "true",
+    }
+
+
+async def _query_trends(
+    project_id: str,
+    dataset_id: str,
+    billing_account_id: str,
+    token: str,
+    project_ids: list[str],
+) -> tuple[dict[str, dict], bool]:
+    """
+    ({project: {month_over_month_delta, anomalies}}, failed) from one windowed query over the
+    standard export table. month_over_month_delta is the % change of the last TREND_DAYS days
+    over the TREND_DAYS before (None without previous spend); anomalies are the MAX_ANOMALIES
+    highest z-scores, each {service, date, cost, expected, z_score}. A failed query yields
+    None / [] and failed=True.
+    """
+    out = {pid: {"month_over_month_delta": None, "anomalies": []} for pid in project_ids}
+    table = _bq_table(project_id, dataset_id, billing_account_id, detailed=False)
+    try:
+        rows = await _query_rows(project_id, token, _trends_sql(table), _query_params(project_ids), _parse_trend_row)
+    except Exception:
+        return out, True
+    for pid, row in rows:
+        if pid not in out:
             continue
-        if key == rid or key == name:
-            total += rc.get("cost", 0)
-        elif rid and key.endswith("/" + rid):
-            total += rc.get("cost", 0)
-        elif name and key.endswith("/" + name):
-            total += rc.get("cost", 0)
-    return total
+        current, previous = row.pop("current"), row.pop("previous")
+        if previous > 0:
+            out[pid]["month_over_month_delta"] = round((current - previous) / previous * 100, 1)
+        if row.pop("anomaly"):
+            row["cost"], row["expected"], row["z_score"] = round(row["cost"], 2), round(row["expected"], 2), round(row["z_score"], 1)
+            out[pid]["anomalies"].append(row)
+    for trends in out.values():
+        trends["anomalies"] = sorted(trends["anomalies"], key=lambda a: a["z_score"], reverse=True)[:MAX_ANOMALIES]
+    return out, False
+
+
+async def _query_costs(
+    cache,
+    project_id: str,
+    dataset_id: str,
+    billing_account_id: str,
+    token: str,
+    detailed: bool,
+    project_ids: list[str],
+) -> tuple[dict[str, dict], bool]:
+    """
+    Everything read from the export for project_ids: ({project: {top_services, resource_costs,
+    month_over_month_delta, anomalies}}, failed). Costs come from the daily rollups when the
+    cache is enabled, else from the direct 30-day queries; trends run concurrently with them.
+    failed is True if any of those queries raised (the results then hold [] / None in its place),
+    as opposed to the export legitimately having no rows for a project.
+    """
+    if cache is not None and cache.enabled:
+        costs = _rollup_costs(cache, project_id, dataset_id, billing_account_id, token, detailed, project_ids)
+    else:
+        costs = _query_bigquery(project_id, dataset_id, billing_account_id, token, detailed, project_ids)
+    (costs, costs_failed), (trends, trends_failed) = await asyncio.gather(
+        costs, _query_trends(project_id, dataset_id, billing_account_id, token, project_ids)
+    )
+    return {
+        pid: {"top_services": costs[pid][0], "resource_costs": costs[pid][1], **trends[pid]}
+        for pid in project_ids
+    }, costs_failed or trends_failed
+
+
+async def _cached_bigquery(
+    cache,
+    project_id: str,
+    dataset_id: str,
+    billing_account_id: str,
+    token: str,
+    detailed: bool,
+    project_ids: list[str],
+) -> dict[str, dict]:
+    """
+    _query_costs per billed project through the KV cache (stale-while-revalidate on the export
+    watermark). Entries are per project, so single- and multi-project views share them; all
+    missing projects are filled by one grouped query and all stale ones by one background refresh.
+    """
+    if cache is None or not cache.enabled:
+        costs, _ = await _query_costs(cache, project_id, dataset_id, billing_account_id, token, detailed, project_ids)
+        return costs
+
+    mode = "detailed" if detailed else "standard"
+    keys = {pid: f"{BILLING_CACHE_PREFIX}:{billing_account_id}:{pid}:{mode}" for pid in project_ids}
+    entries = await asyncio.gather(*(cache.get(keys[pid], "billing") for pid in project_ids))
+    cached = {pid: entry for pid, entry in zip(project_ids, entries) if entry}
+    out = {pid: entry["costs"] for pid, entry in cached.items()}
+
+    stale = {pid: entry for pid, entry in cached.items() if time.time() - entry.get("checked_at", 0) > BILLING_RECHECK_S}
+    if stale:
+        cache.defer(_refresh_bigquery_cache(cache, keys, stale, project_id, dataset_id, billing_account_id, token, detailed))
+
+    missing = [pid for pid in project_ids if pid not in cached]
+    if missing:
+        watermark, (fresh, failed) = await asyncio.gather(
+            _export_watermark(project_id, dataset_id, billing_account_id, token),
+            _query_costs(cache, project_id, dataset_id, billing_account_id, token, detailed, missing),
+        )
+        if not failed:
+            await _put_billing_cache(cache, keys, watermark, fresh)
+        out.update(fresh)
+    return {pid: out[pid] for pid in project_ids}
+
+
+async def _refresh_bigquery_cache(cache, keys, stale, project_id, dataset_id, billing_account_id, token, detailed) -> None:
+    """Background: re-read the export only for projects whose entry predates the table's last change."""
+    watermark = await _export_watermark(project_id, dataset_id, billing_account_id, token)
+    changed = [pid for pid, entry in stale.items() if watermark is None or watermark != entry.get("watermark")]
+    await asyncio.gather(*(
+        cache.put(keys[pid], {**entry, "checked_at": time.time()}, ttl=BILLING_CACHE_TTL_S)
+        for pid, entry in stale.items()
+        if pid not in changed
+    ))
+    if changed:
+        fresh, failed = await _query_costs(cache, project_id, dataset_id, billing_account_id, token, detailed, changed)
+        if not failed:
+            await _put_billing_cache(cache, keys, watermark, fresh)
+
+
+async def _put_billing_cache(cache, keys: dict[str, str], watermark: int | None, results: dict[str, dict]) -> None:
+    """Cache each project's result of a query that succeeded, empty ones included (no spend in the export)."""
+    await asyncio.gather(*(
+        cache.put(keys[pid], {"watermark": watermark, "checked_at": time.time(), "costs": costs}, ttl=BILLING_CACHE_TTL_S)
+        for pid, costs in results.items()
+    ))
+
+
+class _ResourceCostIndex:
+    """
+    resource_costs rows indexed by exact resource_key and by the key's trailing path segment.
+    A row matches a compute resource if its key equals the id or name, or ends with "/<id>" or
+    "/<name>"; every key ending in "/<x>" shares x's trailing segment, so tail candidates only
+    need that endswith check. Matching rows are summed in row order, as a linear scan would.
+    """
+
+    def __init__(self, resource_costs: list[dict]):
+        self._rows = resource_costs
+        self._exact: dict[str, list[int]] = {}
+        self._tail: dict[str, list[int]] = {}
+        self._keys: list[str] = []
+        for i, rc in enumerate(resource_costs):
+            key = (rc.get("resource_key") or "").strip()
+            self._keys.append(key)
+            if not key:
+                continue
+            self._exact.setdefault(key, []).append(i)
+            if "/" in key:
+                self._tail.setdefault(key.rsplit("/", 1)[1], []).append(i)
+
+    def match(self, rid: str, name: str) -> float:
+        """Sum cost from rows whose resource_key matches this compute resource (id or name)."""
+        rid = (rid or "").strip()
+        name = (name or "").strip()
+        rows = set()
+        for value in (rid, name):
+            if not value:
+                continue
+            rows.update(self._exact.get(value, ()))
+            suffix = "/" + value
+            rows.update(i for i in self._tail.get(value.rsplit("/", 1)[-1], ()) if self._keys[i].endswith(suffix))
+        total = 0.0
+        for i in sorted(rows):
+            total += self._rows[i].get("cost", 0)
+        return total
 
 
 def _compute_potential_savings(
@@ -125,6 +624,7 @@ def _compute_potential_savings(
     """
     if not compute or not resource_costs:
         return None
+    index = _ResourceCostIndex(resource_costs)
     by_resource = []
     total = 0.0
     for r in compute:
@@ -133,7 +633,7 @@ def _compute_potential_savings(
             continue
         rid = r.get("id") or ""
         name = r.get("name") or ""
-        cost = _match_resource_cost(rid, name, resource_costs)
+        cost = index.match(rid, name)
         if cost <= 0:
             continue
         # Savable fraction: 100% for stopped/unattached/unused; ~30% for wrong-storage-class
@@ -167,16 +667,90 @@ async def get_project_billing_info(
     *,
     credentials: dict | None = None,
     compute: list[dict] | None = None,
+    cache=None,
 ) -> dict:
     """
     Get billing info for the project. If credentials include billing_export_dataset (and
     optionally billing_export_project_id), queries BigQuery for top_services and
     optionally potential_savings from wasted resources. Use billing_export_use_detailed=True
-    to query the detailed export table for per-resource cost and savings.
+    to query the detailed export table for per-resource cost and savings. With a CacheService,
+    BigQuery results are served from KV and refreshed in the background when the export changes,
+    from daily rollups that only re-query the newest days. month_over_month_delta and anomalies
+    come from one windowed query over daily cost per service.
     """
-    url = f"{BILLING_BASE}/projects/{project_id}/billingInfo"
-    data = await fetch_gcp_api(url, token, "GCP Cloud Billing API")
-    if not data:
+    out = await _billing_account_info(project_id, token, cache)
+    export = _export_settings(credentials, project_id)
+    if export and out["billing_account_id"]:
+        bq_project, bq_dataset, use_detailed = export
+        costs = await _cached_bigquery(
+            cache, bq_project, bq_dataset, out["billing_account_id"], token, use_detailed, [project_id]
+        )
+        costs = costs[project_id]
+        out.update({k: v for k, v in costs.items() if k != "resource_costs"})
+        out["cost_data_available"] = bool(costs["top_services"])
+        if compute and costs["resource_costs"]:
+            out["potential_savings"] = _compute_potential_savings(compute, costs["resource_costs"], out["currency_code"])
+    return out
+
+
+async def get_projects_billing_info(
+    project_ids: list[str],
+    token: str,
+    *,
+    connection_project_id: str,
+    credentials: dict | None = None,
+    cache=None,
+) -> dict[str, dict]:
+    """
+    get_project_billing_info for several projects (without potential_savings): billing info is
+    fetched per project, then projects on the same billing account share one grouped BigQuery
+    query (and the same per-project cache entries). Without billing_export_project_id the export
+    is looked up in the connection's own project, not in any of the requested ones.
+    Returns {project_id: billing}.
+    """
+    infos = await asyncio.gather(*(_billing_account_info(pid, token, cache) for pid in project_ids))
+    out = dict(zip(project_ids, infos))
+    if not project_ids:
+        return out
+    export = _export_settings(credentials, connection_project_id)
+    if not export:
+        return out
+    bq_project, bq_dataset, use_detailed = export
+
+    by_account: dict[str, list[str]] = {}
+    for pid, info in out.items():
+        if info["billing_account_id"]:
+            by_account.setdefault(info["billing_account_id"], []).append(pid)
+    results = await asyncio.gather(*(
+        _cached_bigquery(cache, bq_project, bq_dataset, account, token, use_detailed, pids)
+        for account, pids in by_account.items()
+    ))
+    for costs in results:
+        for pid, project_costs in costs.items():
+            out[pid].update({k: v for k, v in project_costs.items() if k != "resource_costs"})
+            out[pid]["cost_data_available"] = bool(project_costs["top_services"])
+    return out
+
+
+def _export_settings(credentials: dict | None, project_id: str) -> tuple[str, str, bool] | None:
+    """(export project, dataset, use detailed table) from the credentials, or None without an export dataset."""
+    creds = credentials or {}
+    bq_dataset = creds.get("billing_export_dataset_id") or creds.get("billing_export_dataset")
+    if not bq_dataset:
+        return None
+    bq_project = creds.get("billing_export_project_id") or project_id
+    return bq_project, bq_dataset, creds.get("billing_export_use_detailed", False)
+
+
+async def _billing_account_info(project_id: str, token: str, cache=None) -> dict:
+    """
+    Billing payload for the project with account fields filled in and cost fields empty.
+    The billingInfo and billing account lookups go through the long-lived metadata cache.
+    """
+    project = await _cached_metadata(
+        cache, f"{BILLING_META_PREFIX}:project:{project_id}", lambda: _fetch_project_billing(project_id, token)
+    )
+    if not project:
         return {
             "billing_enabled": False,
             "billing_account_id": None,
@@ -189,27 +763,21 @@ async def get_project_billing_info(
             "cost_data_available": False,
         }
 
-    billing_account_name = data.get("billingAccountName") or ""
+    billing_account_name = project["billing_account_name"]
     billing_account_id = billing_account_name.replace("billingAccounts/", "") if billing_account_name else None
-    billing_enabled = data.get("billingEnabled", False)
 
-    display_name = None
-    currency_code = None
+    account = None
     if billing_account_name:
-        account = await fetch_gcp_api(
-            f"{BILLING_BASE}/{billing_account_name}",
-            token,
-            "GCP Cloud Billing API",
+        account = await _cached_metadata(
+            cache, f"{BILLING_META_PREFIX}:{billing_account_name}", lambda: _fetch_billing_account(billing_account_name, token)
         )
-        if account:
-            display_name = account.get("displayName")
-            currency_code = account.get("currencyCode", "USD")
+    account = account or {}
 
-    out = {
-        "billing_enabled": billing_enabled,
+    return {
+        "billing_enabled": project["billing_enabled"],
         "billing_account_id": billing_account_id,
-        "billing_account_display_name": display_name,
-        "currency_code": currency_code or "USD",
+        "billing_account_display_name": account.get("display_name"),
+        "currency_code": account.get("currency_code") or "USD",
         "top_services": [],
         "month_over_month_delta": None,
         "anomalies": [],
@@ -217,16 +785,42 @@ async def get_project_billing_info(
         "cost_data_available": False,
     }
 
-    creds = credentials or {}
-    bq_project = creds.get("billing_export_project_id") or project_id
-    bq_dataset = creds.get("billing_export_dataset_id") or creds.get("billing_export_dataset")
-    use_detailed = creds.get("billing_export_use_detailed", False)
 
-    if bq_dataset and billing_account_id:
-        top_services, resource_costs = await _query_bigquery(bq_project, bq_dataset, billing_account_id, token, use_detailed)
-        out["top_services"] = top_services
-        out["cost_data_available"] = bool(top_services)
-        if compute and resource_costs and currency_code:
-            out["potential_savings"] = _compute_potential_savings(compute, resource_costs, currency_code)
+async def _fetch_project_billing(project_id: str, token: str) -> dict | None:
+    """{billing_account_name, billing_enabled} from projects/{id}/billingInfo; None if the API is off."""
+    data = await fetch_gcp_api(f"{BILLING_BASE}/projects/{project_id}/billingInfo", token, "GCP Cloud Billing API")
+    if not data:
+        return None
+    return {
+        "billing_account_name": data.get("billingAccountName") or "",
+        "billing_enabled": data.get("billingEnabled", False),
+    }
 
-    return out
+
+async def _fetch_billing_account(billing_account_name: str, token: str) -> dict | None:
+    """{display_name, currency_code} of a billing account; None if it can't be read."""
+    account = await fetch_gcp_api(f"{BILLING_BASE}/{billing_account_name}", token, "GCP Cloud Billing API")
+    if not account:
+        return None
+    return {"display_name": account.get("displayName"), "currency_code": account.get("currencyCode", "USD")}
+
+
+async def _cached_metadata(cache, key: str, fetch):
+    """
+    fetch() through KV: a cached value is returned as is (even if None) and re-fetched in the
+    background once BILLING_META_RECHECK_S old. Errors from fetch() are raised, never cached.
+    """
+    if cache is None or not cache.enabled:
+        return await fetch()
+    cached = await cache.get(key, "billing-meta")
+    if cached:
+        if time.time() - cached.get("checked_at", 0) > BILLING_META_RECHECK_S:
+            cache.defer(_refresh_metadata(cache, key, fetch))
+        return cached.get("value")
+    return await _refresh_metadata(cache, key, fetch)
+
+
+async def _refresh_metadata(cache, key: str, fetch):
+    value = await fetch()
+    await cache.put(key, {"value": value, "checked_at": time.time()}, ttl=BILLING_META_TTL_S)
+    return value
@@ -11,7 +11,7 @@ CONTAINER_BASE = "https://container.googleapis.com/v1"
 async def list_instances(project_id: str, token: str) -> list[dict]:
     """Fetch all VM instances across all zones. Flags stopped VMs as waste."""
     url = f"{COMPUTE_BASE}/projects/{project_id}/aggregated/instances"
-    data = await fetch_gcp_api(url, token, "GCP Compute API")
+    data = await fetch_gcp_api(url, token, "GCP Compute API", fields=("items",))
     if not data:
         return []
 
@@ -32,6 +32,7 @@ async def list_instances(project_id: str, token: str) -> list[dict]:
                 "recommended_action": "Delete or start the VM" if is_stopped else "",
                 "machine_type": parse_resource_url(vm.get("machineType", "")),
                 "vm_status": status,
+                "self_link": vm.get("selfLink", ""),
             })
 
     return instances
@@ -40,7 +41,7 @@ async def list_instances(project_id: str, token: str) -> list[dict]:
 async def list_disks(project_id: str, token: str) -> list[dict]:
     """Fetch all persistent disks. Flags unattached disks as waste."""
     url = f"{COMPUTE_BASE}/projects/{project_id}/aggregated/disks"
-    data = await fetch_gcp_api(url, token, "GCP Compute API")
+    data = await fetch_gcp_api(url, token, "GCP Compute API", fields=("items",))
     if not data:
         return []
 
@@ -61,6 +62,7 @@ async def list_disks(project_id: str, token: str) -> list[dict]:
                 "waste_reason": "unattached" if is_unattached else "none",
                 "recommended_action": "Delete this disk to stop charges" if is_unattached else "",
                 "size_gb": size_gb,
+                "disk_type": parse_resource_url(disk.get("type", "")),
                 "attached_to": users[0] if users else None,
             })
 
@@ -70,7 +72,7 @@ async def list_disks(project_id: str, token: str) -> list[dict]:
 async def list_addresses(project_id: str, token: str) -> list[dict]:
     """Fetch all static external IP addresses. Flags unused IPs as waste."""
     url = f"{COMPUTE_BASE}/projects/{project_id}/aggregated/addresses"
-    data = await fetch_gcp_api(url, token, "GCP Compute API")
+    data = await fetch_gcp_api(url, token, "GCP Compute API", fields=("items",))
     if not data:
         return []
 
@@ -185,6 +187,7 @@ async def list_cloud_sql_instances(project_id: str, token: str) -> list[dict]:
             "disk_size_gb": data_disk_size_gb,
             "disk_type": data_disk_type,
             "state": state,
+            "self_link": db.get("selfLink", ""),
         })
 
     return instances
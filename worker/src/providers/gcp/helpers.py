@@ -4,34 +4,65 @@ Monitoring API URL building; Compute resource URL parsing (zone, region, machine
 point value extraction.
 """
 import json
+from collections.abc import Mapping, Sequence
 from datetime import datetime, timedelta, timezone
 from urllib.parse import quote
 
 import js
 from pyodide.ffi import to_js
 
+from utils.stats import STATS
+from utils.timing import span
+
 MONITORING_BASE = "https://monitoring.googleapis.com/v3"
 
 
-async def fetch_gcp_api(url: str, token: str, api_name: str = "GCP API") -> dict:
+def span_name(api_name: str) -> str:
+    """Server-Timing metric name for an API label, e.g. "GCP Monitoring API" -> "monitoring"."""
+    name = api_name.lower().removeprefix("gcp ").removesuffix(" api")
+    return name.replace(" ", "-") or "gcp"
+
+
+# Bodies at least this large (or of unknown length) are parsed on the JS side when
+# the caller says which top-level keys it reads; smaller ones go through bytes.
+LARGE_BODY_BYTES = 256 * 1024
+
+
+async def fetch_gcp_api(
+    url: str,
+    token: str,
+    api_name: str = "GCP API",
+    *,
+    fields: tuple[str, ...] | None = None,
+) -> dict:
     """
     Fetch a GCP API URL with Bearer token. Returns parsed JSON, or empty dict
     if the response is empty or the API is not enabled. Raises on other API errors.
+
+    fields: top-level keys the caller reads (e.g. ("timeSeries",)). Large bodies are
+    then parsed by JS (resp.json()) and only those keys are handed to Python, as
+    lazy views converted one item at a time (see _decode_js), skipping the JS
+    string → Python str copy of the whole payload. Without fields, or for small
+    bodies, the raw bytes are handed to json.loads. A JS-parsed body without a
+    Content-Length has no known size and is counted as unsized in the stats.
     """
-    resp = await js.fetch(
-        url,
-        to_js({"headers": {"Authorization": f"Bearer {token}"}}, dict_converter=js.Object.fromEntries),
-    )
-    raw = await resp.text()
-    if not raw.strip():
-        return {}
+    name = span_name(api_name)
+    with span(name):
+        resp = await js.fetch(
+            url,
+            to_js({"headers": {"Authorization": f"Bearer {token}"}}, dict_converter=js.Object.fromEntries),
+        )
+        size = _content_length(resp)
+        if fields and (size is None or size >= LARGE_BODY_BYTES):
+            data = await _decode_js(resp, fields)
+        else:
+            data, size = await _decode_bytes(resp)
+    STATS.record_bytes(name, size)
 
-    data = json.loads(raw)
     if "error" in data:
-        error_msg = str(data.get("error", {})).lower()
-        if "not enabled" in error_msg or "not been used" in error_msg:
+        if _is_api_disabled(data["error"]):
             return {}
-        raise Exception(f"{api_name} error: {data['error'].get('message', data['error'])}")
+        raise Exception(f"{api_name} error: {_error_message(data['error'])}")
 
     return data
 
@@ -43,21 +74,144 @@ async def fetch_gcp_api_post(url: str, token: str, body: dict, api_name: str = "
         "headers": {"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
         "body": json.dumps(body),
     }
-    resp = await js.fetch(url, to_js(opts, dict_converter=js.Object.fromEntries))
-    raw = await resp.text()
+    name = span_name(api_name)
+    with span(name):
+        resp = await js.fetch(url, to_js(opts, dict_converter=js.Object.fromEntries))
+        data, size = await _decode_bytes(resp)
+    STATS.record_bytes(name, size)
+    if "error" in data:
+        raise Exception(f"{api_name} error: {_error_message(data['error'])}")
+    return data
+
+
+def _content_length(resp) -> int | None:
+    value = resp.headers.get("Content-Length")
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def _decode_bytes(resp) -> tuple[dict, int]:
+    """Read the body as bytes and parse it in Python. Returns (data, body size)."""
+    raw = (await resp.arrayBuffer()).to_bytes()
     if not raw.strip():
+        return {}, len(raw)
+    return json.loads(raw), len(raw)
+
+
+async def _decode_js(resp, fields: tuple[str, ...]) -> dict:
+    """
+    Parse with JS JSON.parse and keep only the requested top-level keys (plus any error).
+    Arrays and objects under those keys stay on the JS side behind _JsArrayView / _JsObjectView,
+    so each item is converted to Python only when read and can be dropped right after; the
+    whole payload never exists as Python objects at once. Raises if the body is not JSON
+    (bodies known to be empty never get here: they are under LARGE_BODY_BYTES).
+    """
+    try:
+        obj = await resp.json()
+    except Exception as e:
+        raise ValueError(f"Response body (HTTP {resp.status}) is not valid JSON: {e}") from e
+    if obj is None:
         return {}
-    data = json.loads(raw)
-    if "error" in data:
-        raise Exception(f"{api_name} error: {data['error'].get('message', data['error'])}")
+    data = {}
+    for key in fields:
+        value = getattr(obj, key, None)
+        if value is not None:
+            data[key] = _lazy(value)
+    error = getattr(obj, "error", None)
+    if error is not None:
+        data["error"] = _to_py(error)
     return data
 
 
-def interval_endpoints(days: int = 30) -> tuple[str, str]:
-    """Return (startTime, endTime) in RFC3339 for the last N days."""
-    now = datetime.now(timezone.utc)
-    start = now - timedelta(days=days)
-    return start.isoformat().replace("+00:00", "Z"), now.isoformat().replace("+00:00", "Z")
+def _to_py(value):
+    return value.to_py() if hasattr(value, "to_py") else value
+
+
+def _lazy(value):
+    """A JS array / object as a read-only Python view over it; other values as they are."""
+    if not hasattr(value, "to_py"):
+        return value
+    if js.Array.isArray(value):
+        return _JsArrayView(value)
+    return _JsObjectView(value)
+
+
+class _JsArrayView(Sequence):
+    """Read-only list over a JS array: each item is converted (to_py) when it is read."""
+
+    def __init__(self, proxy):
+        self._proxy = proxy
+        self._length = proxy.length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return _to_py(self._proxy[index])
+
+
+class _JsObjectView(Mapping):
+    """Read-only dict over a JS object: each value is converted as a lazy view / Python value when read."""
+
+    def __init__(self, proxy):
+        self._proxy = proxy
+        self._keys = dict.fromkeys(js.Object.keys(proxy))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return _lazy(getattr(self._proxy, key))
+
+
+def _is_api_disabled(err) -> bool:
+    """True for "API not enabled / never used in this project" errors, which callers treat as no data."""
+    if not isinstance(err, dict):
+        text = str(err).lower()
+        return "not enabled" in text or "not been used" in text
+    message = (err.get("message") or "").lower()
+    if "not enabled" in message or "not been used" in message:
+        return True
+    return any(
+        isinstance(d, dict) and d.get("reason") == "SERVICE_DISABLED"
+        for d in err.get("details") or []
+    )
+
+
+def _error_message(err) -> str:
+    return err.get("message", err) if isinstance(err, dict) else str(err)
+
+
+def interval_chunks(days: int, chunk_days: int) -> list[tuple[str, str, int]]:
+    """
+    Split the last N days into (startTime, endTime, length in days) chunks in RFC3339, oldest
+    first; the newest ends now. Whole seconds, so aligned points are too.
+    """
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    chunks = []
+    end = 0
+    while end < days:
+        start = min(days, end + chunk_days)
+        chunks.append((
+            (now - timedelta(days=start)).isoformat().replace("+00:00", "Z"),
+            (now - timedelta(days=end)).isoformat().replace("+00:00", "Z"),
+            start - end,
+        ))
+        end = start
+    return chunks[::-1]
 
 
 def value_from_point(point: dict) -> float:
@@ -78,16 +232,27 @@ def build_ts_url(
     end_time: str,
     *,
     per_series_aligner: str = "ALIGN_MEAN",
+    alignment_period: int = 3600,
+    cross_series_reducer: str | None = None,
+    group_by_fields: tuple[str, ...] = (),
 ) -> str:
-    """Build Cloud Monitoring timeSeries list URL. Use ALIGN_RATE for DELTA/DISTRIBUTION metrics (e.g. Cloud Run)."""
-    return (
+    """
+    Build Cloud Monitoring timeSeries list URL. Use ALIGN_RATE for DELTA/DISTRIBUTION metrics (e.g. Cloud Run).
+    alignment_period is in seconds; pass the whole window length to get one point per series.
+    cross_series_reducer + group_by_fields make Monitoring merge series server-side (one per group).
+    """
+    url = (
         f"{MONITORING_BASE}/{project_name}/timeSeries?"
         f"filter={quote(metric_filter)}&"
         f"interval.startTime={quote(start_time)}&"
         f"interval.endTime={quote(end_time)}&"
-        f"aggregation.alignmentPeriod=3600s&"
+        f"aggregation.alignmentPeriod={alignment_period}s&"
         f"aggregation.perSeriesAligner={per_series_aligner}"
     )
+    if cross_series_reducer:
+        url += f"&aggregation.crossSeriesReducer={cross_series_reducer}"
+        url += "".join(f"&aggregation.groupByFields={quote(field)}" for field in group_by_fields)
+    return url
 
 
 # --- Compute: extract resource name from GCP resource URLs (zone, region, machineType, etc.) ---
@@ -1,9 +1,91 @@
 """
 Cloud Monitoring (Stackdriver) — CPU and memory time-series for GCE VMs,
 Cloud Run, Cloud SQL, and GKE. Used for right-sizing and baselines.
+
+Resolutions:
+- full:    hourly points per series (alignmentPeriod=3600s).
+- summary: peaks are aligned over the whole window (one point per series and
+           chunk). Means are aligned at SUMMARY_PERIOD and go through a quantile
+           sketch (sketch.py): avg is the sketch's mean and p50/p95/p99 are
+           percentiles of SUMMARY_PERIOD means, ~120 points per series a month
+           instead of 720 hourly ones. From the metrics store (below) the
+           sketches take the stored hourly means instead.
+- chart:N: at most N points per series. Upstream alignment is coarsened to whole
+           hours while that still leaves LTTB_OVERSAMPLE×N points, then LTTB
+           (series.py) picks the N that keep the chart's shape.
+
+Aggregation levels: GKE containers can be reduced to workload / namespace /
+cluster and Cloud Run revisions to service. Reduced levels use Monitoring's
+crossSeriesReducer + groupByFields, so pod and revision churn is merged
+server-side and never reaches the worker.
+
+All CPU/memory queries for all families are issued concurrently through one
+shared limiter and joined afterwards, so metrics latency is roughly that of the
+slowest single Monitoring call rather than the sum of all of them.
+
+Long windows (up to MAX_DAYS) are split into CHUNK_DAYS chunks fetched
+concurrently; chunks older than the newest are aligned no finer than
+OLDER_CHUNK_PERIOD. Series are stitched across chunks, so hourly data beyond
+the newest chunk is never requested. Averages and percentiles weight each point
+by its alignment period: summary sketches are built per chunk (weight = period
+in hours) and merged, and full series carry their chunks' periods (series.py).
+
+With a metrics store (services/metrics_store.py) and days <= STORE_DAYS, each
+family's hourly means and peaks are kept per series in KV with a watermark;
+a request only fetches [watermark - REFETCH_HOURS, last hour boundary] and
+builds every resolution from the stored hours, so Monitoring cost per view is
+roughly constant instead of proportional to the window.
+
+Filter pushdown: collect_metrics(ids={family: [label values]}) restricts each
+family's queries to `<id label> = one_of(...)`, sharded ID_SHARD_SIZE values per
+query (shards run concurrently). inventory_ids() derives those lists from the
+compute inventory; a family with an empty list is not queried at all. The store
+path ingests every series and applies the same restriction when reading.
+
+Full-resolution items carry a columnar Series under "series" (see series.py);
+serialize_metrics() turns them into the public [{timestamp, cpu_percent,
+ram_percent}] shape at the edge.
 """
+import asyncio
+import json
+import time
+from bisect import bisect_left, bisect_right
+from urllib.parse import quote
+
 from providers.gcp.helpers import fetch_gcp_api
-from providers.gcp.helpers import build_ts_url, interval_endpoints, value_from_point
+from providers.gcp.helpers import build_ts_url, interval_chunks, value_from_point
+from providers.gcp.series import Series, columns, epoch_seconds, iso_timestamp, stitch
+from providers.gcp.sketch import TDigest
+from utils.stats import STATS
+
+# Only these keys are read from list responses; lets fetch_gcp_api skip the rest of large bodies.
+TS_FIELDS = ("timeSeries", "nextPageToken")
+
+RESOLUTIONS = ("full", "summary", "chart")
+MAX_DAYS = 180
+CHUNK_DAYS = 30
+OLDER_CHUNK_PERIOD = 6 * 3600
+# Alignment of the means summary percentiles are taken over (every chunk, newest included).
+SUMMARY_PERIOD = 6 * 3600
+STORE_DAYS = 30
+# Re-fetch the newest stored hours: Monitoring can still be ingesting their samples.
+REFETCH_HOURS = 2
+# Stored series with no point for this long (deleted VMs, replaced revisions / pods) are dropped.
+STORE_STALE_DAYS = 7
+CHART_MIN_POINTS = 10
+CHART_MAX_POINTS = 2000
+# chart:N fetches between N and ~2×LTTB_OVERSAMPLE×N points per series before LTTB.
+LTTB_OVERSAMPLE = 4
+GKE_LEVELS = ("container", "workload", "namespace", "cluster")
+RUN_LEVELS = ("revision", "service")
+
+# Values per one_of(...) clause; larger ID sets are split into concurrent shards.
+ID_SHARD_SIZE = 50
+
+# Shared by every request on the isolate: caps in-flight timeSeries.list calls so the
+# fan-out (up to 16 queries per overview, more with concurrent requests) stays under quota.
+MONITORING_CONCURRENCY = 8
+_monitoring_limiter = asyncio.Semaphore(MONITORING_CONCURRENCY)
 
 # GCE
 GCE_CPU = 'metric.type="compute.googleapis.com/instance/cpu/utilization"'
@@ -22,267 +104,611 @@ GKE_CPU = 'metric.type="kubernetes.io/container/cpu/limit_utilization"'
 GKE_MEMORY = 'metric.type="kubernetes.io/container/memory/limit_utilization"'
 
 
-async def list_instance_metrics(project_id: str, token: str, days: int = 30) -> list[dict]:
+# --- Value normalization (Monitoring reports utilization as 0–1 or 0–100 depending on the metric) ---
+
+
+def _fraction_pct(val: float) -> float:
+    return val * 100
+
+
+def _auto_pct(val: float) -> float:
+    """Some utilizations can be 0-1 or 0-100; normalize to percent."""
+    return val * 100 if val <= 1 else val
+
+
+def _raw_pct(val: float) -> float:
+    return val
+
+
+# --- Series keys (from a timeSeries' labels) and the metric item built from a key ---
+
+
+def _region(location: str) -> str:
+    return location.rsplit("-", 1)[0] if location else ""
+
+
+def _labels(ts: dict) -> dict:
+    return ts.get("resource", {}).get("labels", {})
+
+
+def _gce_key(ts: dict) -> str | None:
+    labels = _labels(ts)
+    instance_id = labels.get("instance_id", "")
+    return f"{labels.get('zone', '')}/{instance_id}" if instance_id else None
+
+
+def _gce_item(key: str) -> dict:
+    zone, instance_id = key.split("/", 1) if "/" in key else ("", key)
+    return {"id": instance_id, "name": instance_id, "region": _region(zone)}
+
+
+def _run_key(ts: dict) -> str | None:
+    labels = _labels(ts)
+    service_name = labels.get("service_name", "")
+    if not service_name:
+        return None
+    return f"{labels.get('location', '')}/{service_name}/{labels.get('revision_name', '')}"
+
+
+def _run_item(key: str) -> dict:
+    parts = key.split("/", 2)
+    location = parts[0] if len(parts) > 0 else ""
+    service_name = parts[1] if len(parts) > 1 else key
+    revision_name = parts[2] if len(parts) > 2 else ""
+    return {
+        "id": key,
+        "name": f"{service_name} ({revision_name})" if revision_name else service_name,
+        "region": _region(location),
+    }
+
+
+def _sql_key(ts: dict) -> str | None:
+    return _labels(ts).get("database_id", "") or None
+
+
+def _sql_item(database_id: str) -> dict:
+    # database_id is often "project:region:instance"
+    name = database_id.split(":")[-1] if ":" in database_id else database_id
+    region = database_id.split(":")[-2] if database_id.count(":") >= 2 else ""
+    return {"id": database_id, "name": name, "region": region}
+
+
+def _gke_key(ts: dict) -> str | None:
+    labels = _labels(ts)
+    cluster = labels.get("cluster_name", "")
+    container = labels.get("container_name", "")
+    if not cluster or not container:
+        return None
+    return (
+        f"{labels.get('location', '')}/{cluster}/{labels.get('namespace_name', '')}/"
+        f"{labels.get('pod_name', '')}/{container}"
+    )
+
+
+def _gke_item(key: str) -> dict:
+    parts = key.split("/", 4)
+    location = parts[0] if len(parts) > 0 else ""
+    namespace = parts[2] if len(parts) > 2 else ""
+    pod = parts[3] if len(parts) > 3 else ""
+    container = parts[4] if len(parts) > 4 else ""
+    return {
+        "id": key,
+        "name": f"{container} ({namespace}/{pod})" if pod else f"{container} ({namespace})",
+        "region": _region(location),
+    }
+
+
+def _run_service_key(ts: dict) -> str | None:
+    labels = _labels(ts)
+    service_name = labels.get("service_name", "")
+    return f"{labels.get('location', '')}/{service_name}" if service_name else None
+
+
+def _run_service_item(key: str) -> dict:
+    location, _, service_name = key.partition("/")
+    return {"id": key, "name": service_name, "region": _region(location)}
+
+
+def _gke_group_key(depth: int):
+    """Key for GKE series reduced to location/cluster[/namespace]; depth = number of path parts."""
+    def key(ts: dict) -> str | None:
+        labels = _labels(ts)
+        if not labels.get("cluster_name"):
+            return None
+        parts = (labels.get("location", ""), labels["cluster_name"], labels.get("namespace_name", ""))
+        return "/".join(parts[:depth])
+    return key
+
+
+def _gke_namespace_item(key: str) -> dict:
+    location, cluster, namespace = (key.split("/", 2) + ["", ""])[:3]
+    return {"id": key, "name": f"{namespace} ({cluster})", "region": _region(location)}
+
+
+def _gke_cluster_item(key: str) -> dict:
+    location, _, cluster = key.partition("/")
+    return {"id": key, "name": cluster, "region": _region(location)}
+
+
+def _gke_workload_key(ts: dict) -> str | None:
+    namespace_key = _gke_group_key(3)(ts)
+    system = ts.get("metadata", {}).get("systemLabels", {})
+    controller = system.get("top_level_controller_name", "")
+    if not namespace_key or not controller:
+        return None
+    return f"{namespace_key}/{system.get('top_level_controller_type', '')}/{controller}"
+
+
+def _gke_workload_item(key: str) -> dict:
+    location, cluster, namespace, kind, controller = (key.split("/", 4) + [""] * 4)[:5]
+    return {
+        "id": key,
+        "name": f"{controller} ({namespace}/{kind})" if kind else f"{controller} ({namespace})",
+        "region": _region(location),
+    }
+
+
+_GKE_CLUSTER_FIELDS = ("resource.labels.location", "resource.labels.cluster_name")
+_GKE_NAMESPACE_FIELDS = _GKE_CLUSTER_FIELDS + ("resource.labels.namespace_name",)
+_GKE_WORKLOAD_FIELDS = _GKE_NAMESPACE_FIELDS + (
+    "metadata.system_labels.top_level_controller_type",
+    "metadata.system_labels.top_level_controller_name",
+)
+
+
+# Per resource family: metric filters, aligners/reducers, value normalization, and series keying.
+# Cloud Run metrics are DELTA DISTRIBUTION: ALIGN_SUM (mean of the merged distribution)
+# stands in for ALIGN_MEAN, and ALIGN_PERCENTILE_99 for ALIGN_MAX, which distributions don't
+# support; REDUCE_SUM merges the distributions of a group so their mean stays a true mean.
+# Families with group_by are reduced across series (mean_reducer for means, REDUCE_MAX for peaks).
+# id_label / id_of: the resource label filters push down on, and its value recovered from a series key.
+# inventory: (compute.py resource_type, entry → label value or None to skip) for inventory_ids().
+_GCE = {
+    "cpu": GCE_CPU, "memory": GCE_MEMORY,
+    "cpu_pct": _fraction_pct, "ram_pct": _raw_pct,
+    "key": _gce_key, "item": _gce_item,
+    "id_label": "resource.labels.instance_id", "id_of": lambda key: key.rsplit("/", 1)[-1],
+    "inventory": ("vm", lambda r, _: str(r["id"]) if r.get("vm_status") == "RUNNING" else None),
+}
+_RUN = {
+    "cpu": RUN_CPU, "memory": RUN_MEMORY,
+    "cpu_pct": _auto_pct, "ram_pct": _auto_pct,
+    "key": _run_key, "item": _run_item,
+    "mean_aligner": "ALIGN_SUM", "peak_aligner": "ALIGN_PERCENTILE_99", "mean_reducer": "REDUCE_SUM",
+    "id_label": "resource.labels.service_name", "id_of": lambda key: key.split("/")[1],
+    "inventory": ("cloud-run", lambda r, _: r.get("name") or None),
+}
+_SQL = {
+    "cpu": SQL_CPU, "memory": SQL_MEMORY,
+    "cpu_pct": _auto_pct, "ram_pct": _auto_pct,
+    "key": _sql_key, "item": _sql_item,
+    "id_label": "resource.labels.database_id", "id_of": lambda key: key,
+    "inventory": ("cloud-sql", lambda r, pid: f"{pid}:{r['name']}" if r.get("state") == "RUNNABLE" else None),
+}
+_GKE = {
+    "cpu": GKE_CPU, "memory": GKE_MEMORY,
+    "cpu_pct": _fraction_pct, "ram_pct": _fraction_pct,
+    "key": _gke_key, "item": _gke_item,
+    "id_label": "resource.labels.cluster_name", "id_of": lambda key: key.split("/")[1],
+    "inventory": ("gke-cluster", lambda r, _: r.get("name") or None),
+}
+
+FAMILIES: dict[str, dict] = {
+    "vm": _GCE,
+    "cloud_run": _RUN,
+    "cloud_run_service": {
+        **_RUN, "key": _run_service_key, "item": _run_service_item,
+        "group_by": ("resource.labels.location", "resource.labels.service_name"),
+    },
+    "cloud_sql": _SQL,
+    "gke_container": _GKE,
+    "gke_workload": {**_GKE, "key": _gke_workload_key, "item": _gke_workload_item, "group_by": _GKE_WORKLOAD_FIELDS},
+    "gke_namespace": {**_GKE, "key": _gke_group_key(3), "item": _gke_namespace_item, "group_by": _GKE_NAMESPACE_FIELDS},
+    "gke_cluster": {**_GKE, "key": _gke_group_key(2), "item": _gke_cluster_item, "group_by": _GKE_CLUSTER_FIELDS},
+}
+
+
+def gke_family(level: str) -> str:
+    return f"gke_{level}" if level in GKE_LEVELS else "gke_container"
+
+
+def run_family(level: str) -> str:
+    return "cloud_run_service" if level == "service" else "cloud_run"
+
+
+def parse_resolution(value: str | None) -> tuple[str, int | None] | None:
+    """'full' / 'summary' / 'chart:N' → (mode, N or None); None if unrecognized. N is clamped."""
+    if value in ("full", "summary"):
+        return value, None
+    mode, _, points = (value or "").partition(":")
+    if mode != "chart":
+        return None
+    try:
+        return mode, max(CHART_MIN_POINTS, min(CHART_MAX_POINTS, int(points)))
+    except ValueError:
+        return None
+
+
+def chart_period(days: int, points: int) -> int:
+    """Coarsest whole-hour alignmentPeriod that still leaves LTTB_OVERSAMPLE× `points` to downsample from."""
+    return 3600 * max(1, (days * 24) // (points * LTTB_OVERSAMPLE))
+
+
+def inventory_ids(families: list[str], compute: list[dict], project_id: str) -> dict[str, list[str]]:
+    """{family: label values} for the resources compute.py listed (running VMs / SQL, services, clusters)."""
+    ids = {}
+    for family in families:
+        resource_type, value = FAMILIES[family]["inventory"]
+        found = (value(r, project_id) for r in compute if r.get("resource_type") == resource_type)
+        ids[family] = sorted({v for v in found if v})
+    return ids
+
+
+def _id_filters(family: str, ids: list[str] | None) -> list[str | None]:
+    """Extra filter clauses for one family: [None] = unfiltered, [] = nothing to query."""
+    if ids is None:
+        return [None]
+    label = FAMILIES[family]["id_label"]
+    return [
+        f"{label} = one_of({', '.join(json.dumps(v) for v in ids[i:i + ID_SHARD_SIZE])})"
+        for i in range(0, len(ids), ID_SHARD_SIZE)
+    ]
+
+
+def _queries(family: str, resolution: str) -> dict[str, tuple[str, str, str, bool]]:
     """
-    Fetch CPU (and if available, memory) time-series for all Compute Engine instances.
-    Returns one entry per instance with metrics array: [{ timestamp, cpu_percent, ram_percent }].
+    Slot → (cpu|memory, aligner, reducer, whole_window) for every query a family needs at
+    this resolution ("store" = what the metrics store keeps). whole_window queries align over
+    the full window; the rest are hourly (or coarser, see collect_metrics).
     """
-    start_time, end_time = interval_endpoints(days)
-    project_name = f"projects/{project_id}"
+    spec = FAMILIES[family]
+    mean = (spec.get("mean_aligner", "ALIGN_MEAN"), spec.get("mean_reducer", "REDUCE_MEAN"))
+    if resolution in ("full", "chart"):
+        return {"cpu": ("cpu", *mean, False), "ram": ("memory", *mean, False)}
+    peak = (spec.get("peak_aligner", "ALIGN_MAX"), "REDUCE_MAX")
+    whole_window = resolution == "summary"
+    return {
+        "cpu_dist": ("cpu", *mean, False),
+        "cpu_peak": ("cpu", *peak, whole_window),
+        "ram_dist": ("memory", *mean, False),
+        "ram_peak": ("memory", *peak, whole_window),
+    }
 
-    cpu_data = await fetch_gcp_api(
-        build_ts_url(project_name, GCE_CPU, start_time, end_time), token, "GCP Monitoring API"
-    )
-    if not cpu_data:
-        return []
 
-    by_instance: dict[str, list[dict]] = {}
-    for ts in cpu_data.get("timeSeries", []):
-        resource_labels = ts.get("resource", {}).get("labels", {})
-        instance_id = resource_labels.get("instance_id", "")
-        zone = resource_labels.get("zone", "")
-        if not instance_id:
-            continue
-        points = []
-        for point in ts.get("points", []):
-            end = point.get("interval", {}).get("endTime", "")
-            val = value_from_point(point)
-            points.append({"timestamp": end, "cpu_percent": round(val * 100, 2), "ram_percent": None})
-        key = f"{zone}/{instance_id}"
-        by_instance[key] = points
-
-    memory_data = await fetch_gcp_api(
-        build_ts_url(project_name, GCE_MEMORY, start_time, end_time), token, "GCP Monitoring API"
+async def _fetch_series(
+    project_id: str,
+    family: str,
+    query: tuple[str, str, str, bool],
+    start_time: str,
+    end_time: str,
+    period: int,
+    token: str,
+    id_filter: str | None = None,
+) -> dict[str, tuple] | None:
+    """
+    One timeSeries.list query, every page → {series key: (epoch times, percents)}. None if
+    Monitoring returned nothing. Raises if any page fails, so a result is always complete.
+    """
+    spec = FAMILIES[family]
+    kind, aligner, reducer, _ = query
+    to_pct = spec["cpu_pct"] if kind == "cpu" else spec["ram_pct"]
+    group_by = spec.get("group_by", ())
+    url = build_ts_url(
+        f"projects/{project_id}",
+        f"{spec[kind]} AND {id_filter}" if id_filter else spec[kind],
+        start_time,
+        end_time,
+        per_series_aligner=aligner,
+        alignment_period=period,
+        cross_series_reducer=reducer if group_by else None,
+        group_by_fields=group_by,
     )
-    if memory_data:
-        for ts in memory_data.get("timeSeries", []):
-            resource_labels = ts.get("resource", {}).get("labels", {})
-            instance_id = resource_labels.get("instance_id", "")
-            zone = resource_labels.get("zone", "")
-            if not instance_id:
-                continue
-            key = f"{zone}/{instance_id}"
-            if key not in by_instance:
+    points: dict[str, list] = {}
+    page_token = None
+    while True:
+        page_url = f"{url}&pageToken={quote(page_token)}" if page_token else url
+        async with _monitoring_limiter:
+            data = await fetch_gcp_api(page_url, token, "GCP Monitoring API", fields=TS_FIELDS)
+        if not data and page_token is None:
+            return None
+        # A series can continue on the next page: its points are gathered under the same key.
+        for ts in data.get("timeSeries", []):
+            key = spec["key"](ts)
+            if not key:
                 continue
-            time_to_idx = {p["timestamp"]: i for i, p in enumerate(by_instance[key])}
-            for point in ts.get("points", []):
-                end = point.get("interval", {}).get("endTime", "")
-                val = value_from_point(point)
-                if end in time_to_idx:
-                    by_instance[key][time_to_idx[end]]["ram_percent"] = round(val, 2)
+            points.setdefault(key, []).extend(
+                (point.get("interval", {}).get("endTime", ""), round(to_pct(value_from_point(point)), 2))
+                for point in ts.get("points", [])
+            )
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            return {key: columns(rows) for key, rows in points.items()}
 
-    result = []
-    for key, points in by_instance.items():
-        zone, instance_id = key.split("/", 1) if "/" in key else ("", key)
-        result.append({
-            "id": instance_id,
-            "name": instance_id,
-            "provider": "gcp",
-            "resource_type": "vm",
-            "region": zone.rsplit("-", 1)[0] if zone else "",
-            "metrics": sorted(points, key=lambda p: p["timestamp"]),
-        })
-    return result
 
+def _new_item(family: str, key: str) -> dict:
+    return {**FAMILIES[family]["item"](key), "provider": "gcp", "resource_type": family}
 
-async def list_cloud_run_metrics(project_id: str, token: str, days: int = 30) -> list[dict]:
-    """CPU and memory utilization for Cloud Run revisions (services)."""
-    start_time, end_time = interval_endpoints(days)
-    project_name = f"projects/{project_id}"
 
-    # Cloud Run metrics are DELTA DISTRIBUTION; ALIGN_RATE is valid (ALIGN_MEAN is not).
-    cpu_data = await fetch_gcp_api(
-        build_ts_url(project_name, RUN_CPU, start_time, end_time, per_series_aligner="ALIGN_SUM"),
-        token,
-        "GCP Monitoring API",
-    )
-    if not cpu_data:
+def _full_items(family: str, series: dict, periods: tuple = ()) -> list[dict]:
+    """Hourly CPU points per series, with memory joined on matching timestamps; periods as in Series."""
+    cpu = series.get("cpu")
+    if not cpu:
         return []
-
-    by_revision: dict[str, list[dict]] = {}
-    for ts in cpu_data.get("timeSeries", []):
-        labels = ts.get("resource", {}).get("labels", {})
-        service_name = labels.get("service_name", "")
-        revision_name = labels.get("revision_name", "")
-        location = labels.get("location", "")
-        if not service_name:
-            continue
-        key = f"{location}/{service_name}/{revision_name}"
-        points = []
-        for point in ts.get("points", []):
-            end = point.get("interval", {}).get("endTime", "")
-            val = value_from_point(point)
-            # run utilizations can be 0-1 or 0-100; normalize to percent
-            pct = val * 100 if val <= 1 else val
-            points.append({"timestamp": end, "cpu_percent": round(pct, 2), "ram_percent": None})
-        by_revision[key] = points
-
-    memory_data = await fetch_gcp_api(
-        build_ts_url(project_name, RUN_MEMORY, start_time, end_time, per_series_aligner="ALIGN_SUM"),
-        token,
-        "GCP Monitoring API",
-    )
-    if memory_data:
-        for ts in memory_data.get("timeSeries", []):
-            labels = ts.get("resource", {}).get("labels", {})
-            service_name = labels.get("service_name", "")
-            revision_name = labels.get("revision_name", "")
-            location = labels.get("location", "")
-            if not service_name:
-                continue
-            key = f"{location}/{service_name}/{revision_name}"
-            if key not in by_revision:
-                continue
-            time_to_idx = {p["timestamp"]: i for i, p in enumerate(by_revision[key])}
-            for point in ts.get("points", []):
-                end = point.get("interval", {}).get("endTime", "")
-                val = value_from_point(point)
-                pct = val * 100 if val <= 1 else val
-                if end in time_to_idx:
-                    by_revision[key][time_to_idx[end]]["ram_percent"] = round(pct, 2)
+    memory = series.get("ram") or {}
 
     result = []
-    for key, points in by_revision.items():
-        parts = key.split("/", 2)
-        location = parts[0] if len(parts) > 0 else ""
-        service_name = parts[1] if len(parts) > 1 else key
-        revision_name = parts[2] if len(parts) > 2 else ""
-        result.append({
-            "id": key,
-            "name": f"{service_name} ({revision_name})" if revision_name else service_name,
-            "provider": "gcp",
-            "resource_type": "cloud_run",
-            "region": location.rsplit("-", 1)[0] if location else "",
-            "metrics": sorted(points, key=lambda p: p["timestamp"]),
-        })
+    for key, (times, values) in cpu.items():
+        series = Series(times, values, periods=periods)
+        if key in memory:
+            series.join_ram(*memory[key])
+        result.append({**_new_item(family, key), "series": series})
     return result
 
 
-async def list_cloud_sql_metrics(project_id: str, token: str, days: int = 30) -> list[dict]:
-    """CPU and memory utilization for Cloud SQL instances."""
-    start_time, end_time = interval_endpoints(days)
-    project_name = f"projects/{project_id}"
-
-    cpu_data = await fetch_gcp_api(
-        build_ts_url(project_name, SQL_CPU, start_time, end_time), token, "GCP Monitoring API"
-    )
-    if not cpu_data:
+def _summary_items(family: str, series: dict) -> list[dict]:
+    """
+    Per series: CPU/memory means and p50/p95/p99 from the quantile sketches of the aligned
+    means ("cpu_dist" / "ram_dist"), plus whole-window peaks. The sketches stay on the item
+    under "sketches" so callers can merge them.
+    """
+    cpu_dist = series.get("cpu_dist")
+    if not cpu_dist:
         return []
-
-    by_db: dict[str, list[dict]] = {}
-    for ts in cpu_data.get("timeSeries", []):
-        labels = ts.get("resource", {}).get("labels", {})
-        database_id = labels.get("database_id", "")
-        if not database_id:
-            continue
-        points = []
-        for point in ts.get("points", []):
-            end = point.get("interval", {}).get("endTime", "")
-            val = value_from_point(point)
-            # 10^2.% can be 0-1 or 0-100
-            pct = val * 100 if val <= 1 else val
-            points.append({"timestamp": end, "cpu_percent": round(pct, 2), "ram_percent": None})
-        by_db[database_id] = points
-
-    memory_data = await fetch_gcp_api(
-        build_ts_url(project_name, SQL_MEMORY, start_time, end_time), token, "GCP Monitoring API"
-    )
-    if memory_data:
-        for ts in memory_data.get("timeSeries", []):
-            labels = ts.get("resource", {}).get("labels", {})
-            database_id = labels.get("database_id", "")
-            if not database_id or database_id not in by_db:
-                continue
-            time_to_idx = {p["timestamp"]: i for i, p in enumerate(by_db[database_id])}
-            for point in ts.get("points", []):
-                end = point.get("interval", {}).get("endTime", "")
-                val = value_from_point(point)
-                pct = val * 100 if val <= 1 else val
-                if end in time_to_idx:
-                    by_db[database_id][time_to_idx[end]]["ram_percent"] = round(pct, 2)
+    cpu_peak = series.get("cpu_peak") or {}
+    ram_peak = series.get("ram_peak") or {}
+    ram_dist = series.get("ram_dist") or {}
 
     result = []
-    for database_id, points in by_db.items():
-        # database_id is often "project:region:instance"
-        name = database_id.split(":")[-1] if ":" in database_id else database_id
-        region = database_id.split(":")[-2] if database_id.count(":") >= 2 else ""
+    for key, cpu in cpu_dist.items():
+        ram = ram_dist.get(key) or TDigest()
         result.append({
-            "id": database_id,
-            "name": name,
-            "provider": "gcp",
-            "resource_type": "cloud_sql",
-            "region": region,
-            "metrics": sorted(points, key=lambda p: p["timestamp"]),
+            **_new_item(family, key),
+            "metrics": [],
+            "summary": {
+                "avg_cpu_percent": _round(cpu.mean),
+                "peak_cpu_percent": _peak(cpu_peak.get(key)),
+                "avg_ram_percent": _round(ram.mean),
+                "peak_ram_percent": _peak(ram_peak.get(key)),
+                **percentile_fields(cpu, ram),
+            },
+            "sketches": {"cpu": cpu, "ram": ram},
         })
     return result
 
 
-async def list_gke_metrics(project_id: str, token: str, days: int = 30) -> list[dict]:
-    """CPU and memory limit utilization for GKE containers."""
-    start_time, end_time = interval_endpoints(days)
-    project_name = f"projects/{project_id}"
+def percentile_fields(cpu: TDigest, ram: TDigest) -> dict:
+    """p50/p95/p99 CPU and RAM fields (e.g. p95_cpu_percent) from two sketches."""
+    fields = {}
+    for column, digest in (("cpu", cpu), ("ram", ram)):
+        for pct, value in digest.percentiles().items():
+            fields[f"p{pct}_{column}_percent"] = value
+    return fields
 
-    cpu_data = await fetch_gcp_api(
-        build_ts_url(project_name, GKE_CPU, start_time, end_time), token, "GCP Monitoring API"
-    )
-    if not cpu_data:
-        return []
 
-    by_container: dict[str, list[dict]] = {}
-    for ts in cpu_data.get("timeSeries", []):
-        labels = ts.get("resource", {}).get("labels", {})
-        cluster = labels.get("cluster_name", "")
-        location = labels.get("location", "")
-        namespace = labels.get("namespace_name", "")
-        pod = labels.get("pod_name", "")
-        container = labels.get("container_name", "")
-        if not cluster or not container:
+def _round(value: float | None) -> float | None:
+    return round(value, 2) if value is not None else None
+
+
+def _peak(columns_: tuple | None) -> float | None:
+    if not columns_ or not len(columns_[1]):
+        return None
+    return max(columns_[1])
+
+
+def serialize_metrics(items: list[dict]) -> list[dict]:
+    """Edge conversion: replace each item's columnar series with the JSON point list and drop sketches."""
+    out = []
+    for item in items:
+        public = {k: v for k, v in item.items() if k not in ("series", "sketches")}
+        series = item.get("series")
+        if series is not None:
+            public["metrics"] = series.to_points()
+        out.append(public)
+    return out
+
+
+async def collect_metrics(
+    project_id: str,
+    token: str,
+    families: list[str],
+    days: int = 30,
+    resolution: str = "full",
+    store=None,
+    ids: dict[str, list[str]] | None = None,
+) -> list[dict]:
+    """
+    Fetch CPU and memory for every family and time chunk concurrently (bounded by the shared
+    Monitoring limiter), then join per family. Items come back grouped in the order of
+    `families`, still columnar — pass them through serialize_metrics() before returning JSON.
+    With an enabled `store` (MetricsStore), windows up to STORE_DAYS are served incrementally.
+    `ids` ({family: label values}) restricts families to those resources; see _id_filters.
+    """
+    mode, points = parse_resolution(resolution) or ("full", None)
+    days = max(1, min(MAX_DAYS, days))
+    ids = ids or {}
+    if store is not None and store.enabled and days <= STORE_DAYS:
+        return await _collect_stored(project_id, token, families, days, mode, points, store, ids)
+    chunks = interval_chunks(days, CHUNK_DAYS)
+    if mode == "chart":
+        base = chart_period(days, points)
+    else:
+        base = SUMMARY_PERIOD if mode == "summary" else 3600
+    jobs = []
+    periods = []
+    for i, (start_time, end_time, chunk_days) in enumerate(chunks):
+        aligned = base if i == len(chunks) - 1 else max(base, OLDER_CHUNK_PERIOD)
+        periods.append((epoch_seconds(end_time), aligned))
+        for family in families:
+            for slot, query in _queries(family, mode).items():
+                period = chunk_days * 86400 if query[3] else aligned
+                for id_filter in _id_filters(family, ids.get(family)):
+                    jobs.append((family, slot, query, start_time, end_time, period, id_filter))
+    results = await asyncio.gather(*(
+        _fetch_series(project_id, family, query, start_time, end_time, period, token, id_filter)
+        for family, _, query, start_time, end_time, period, id_filter in jobs
+    ))
+
+    # Jobs are ordered oldest chunk first: stitch columns (or merge sketches) in that order.
+    parts: dict[str, dict[str, dict[str, list]]] = {family: {} for family in families}
+    for (family, slot, _, _, _, period, _), data in zip(jobs, results):
+        by_key = parts[family].setdefault(slot, {})
+        for key, cols in (data or {}).items():
+            by_key.setdefault(key, []).append((cols, period))
+
+    series: dict[str, dict] = {}
+    for family in families:
+        series[family] = {}
+        for slot, by_key in parts[family].items():
+            if slot.endswith("_dist"):
+                series[family][slot] = {key: _chunk_digest(per_chunk) for key, per_chunk in by_key.items()}
+            else:
+                series[family][slot] = {key: stitch([cols for cols, _ in per_chunk]) for key, per_chunk in by_key.items()}
+    return _build_items(families, series, mode, points, tuple(periods))
+
+
+def _chunk_digest(chunks: list[tuple[tuple, int]]) -> TDigest:
+    """
+    One sketch per chunk of ((times, values), alignment period), each point weighted by its
+    period in hours, merged. Points a later chunk repeats at the boundary are counted once.
+    """
+    digest = TDigest()
+    last = None
+    for (times, values), period in chunks:
+        skip = bisect_right(times, last) if last is not None else 0
+        digest.merge(TDigest.of(values[skip:], weight=period / 3600))
+        if len(times):
+            last = times[-1]
+    return digest
+
+
+async def _collect_stored(project_id, token, families, days, mode, points, store, ids) -> list[dict]:
+    """collect_metrics from the incremental store: top up each family, then slice the window (and ids)."""
+    end = int(time.time()) // 3600 * 3600
+    cutoff = end - days * 86400
+    stored = await asyncio.gather(*(_refresh_stored(project_id, family, token, store, end) for family in families))
+
+    series: dict[str, dict] = {}
+    for family, slots in zip(families, stored):
+        window = {slot: _since(by_key, cutoff) for slot, by_key in slots.items()}
+        if family in ids:
+            wanted, id_of = set(ids[family]), FAMILIES[family]["id_of"]
+            window = {
+                slot: {key: cols for key, cols in by_key.items() if id_of(key) in wanted}
+                for slot, by_key in window.items()
+            }
+        if mode == "summary":
+            series[family] = {"cpu_peak": window.get("cpu_peak", {}), "ram_peak": window.get("ram_peak", {})}
+            for column in ("cpu", "ram"):
+                by_key = window.get(f"{column}_dist", {})
+                series[family][f"{column}_dist"] = {key: TDigest.of(values) for key, (_, values) in by_key.items()}
+        else:
+            series[family] = {"cpu": window.get("cpu_dist", {}), "ram": window.get("ram_dist", {})}
+    return _build_items(families, series, mode, points)
+
+
+async def _refresh_stored(project_id: str, family: str, token: str, store, end: int) -> dict[str, dict]:
+    """
+    Stored hourly slots ({slot: {key: (times, values)}}) for one family, topped up from
+    Monitoring through `end` (an hour boundary) and trimmed to STORE_DAYS; series idle for
+    STORE_STALE_DAYS are dropped. Points the re-fetch returns replace stored ones from `start` on.
+    The watermark only moves to `end` when every query came back (all pages); if one failed,
+    its slot keeps the stored points and the next request re-fetches from the old watermark.
+    """
+    data = await store.get(project_id, family) or {}
+    horizon = end - STORE_DAYS * 86400
+    watermark = data.get("watermark")
+    start = max(horizon, watermark - REFETCH_HOURS * 3600) if watermark else horizon
+    slots = data.get("slots") or {}
+    if watermark == end:
+        return slots
+
+    # Peaks are stored hourly too (max of hourly peaks = window peak), so every slot is aligned at 3600s.
+    queries = _queries(family, "store")
+    fetched = await asyncio.gather(*(
+        _fetch_series(project_id, family, query, iso_timestamp(start), iso_timestamp(end), 3600, token)
+        for query in queries.values()
+    ), return_exceptions=True)
+    failed = [f for f in fetched if isinstance(f, Exception)]
+    if len(failed) == len(fetched):
+        raise failed[0]
+    stale = end - STORE_STALE_DAYS * 86400
+    for slot, new in zip(queries, fetched):
+        old = _since(slots.get(slot, {}), horizon)
+        if isinstance(new, Exception):
+            slots[slot] = old
             continue
-        key = f"{location}/{cluster}/{namespace}/{pod}/{container}"
-        points = []
-        for point in ts.get("points", []):
-            end = point.get("interval", {}).get("endTime", "")
-            val = value_from_point(point)
-            points.append({"timestamp": end, "cpu_percent": round(val * 100, 2), "ram_percent": None})
-        by_container[key] = points
-
-    memory_data = await fetch_gcp_api(
-        build_ts_url(project_name, GKE_MEMORY, start_time, end_time), token, "GCP Monitoring API"
-    )
-    if memory_data:
-        for ts in memory_data.get("timeSeries", []):
-            labels = ts.get("resource", {}).get("labels", {})
-            cluster = labels.get("cluster_name", "")
-            location = labels.get("location", "")
-            namespace = labels.get("namespace_name", "")
-            pod = labels.get("pod_name", "")
-            container = labels.get("container_name", "")
-            if not cluster or not container:
-                continue
-            key = f"{location}/{cluster}/{namespace}/{pod}/{container}"
-            if key not in by_container:
-                continue
-            time_to_idx = {p["timestamp"]: i for i, p in enumerate(by_container[key])}
-            for point in ts.get("points", []):
-                end = point.get("interval", {}).get("endTime", "")
-                val = value_from_point(point)
-                if end in time_to_idx:
-                    by_container[key][time_to_idx[end]]["ram_percent"] = round(val * 100, 2)
+        new = new or {}
+        merged = {}
+        for key in old.keys() | new.keys():
+            parts = []
+            if key in old:
+                times, values = old[key]
+                keep = bisect_left(times, start + 1)
+                parts.append((times[:keep], values[:keep]))
+            if key in new:
+                parts.append(new[key])
+            times, values = stitch(parts)
+            if len(times) and times[-1] > stale:
+                merged[key] = (times, values)
+        slots[slot] = merged
 
-    result = []
-    for key, points in by_container.items():
-        parts = key.split("/", 4)
-        location = parts[0] if len(parts) > 0 else ""
-        cluster = parts[1] if len(parts) > 1 else ""
-        namespace = parts[2] if len(parts) > 2 else ""
-        pod = parts[3] if len(parts) > 3 else ""
-        container = parts[4] if len(parts) > 4 else ""
-        result.append({
-            "id": key,
-            "name": f"{container} ({namespace}/{pod})" if pod else f"{container} ({namespace})",
-            "provider": "gcp",
-            "resource_type": "gke_container",
-            "region": location.rsplit("-", 1)[0] if location else "",
-            "metrics": sorted(points, key=lambda p: p["timestamp"]),
-        })
-    return result
+    if failed:
+        STATS.incr("metrics_store_partial_refreshes")
+    await store.put(project_id, family, watermark if failed else end, slots)
+    return slots
+
+
+def _since(by_key: dict[str, tuple], cutoff: int) -> dict[str, tuple]:
+    """Each series sliced to points after `cutoff`; series left empty are dropped."""
+    out = {}
+    for key, (times, values) in by_key.items():
+        i = bisect_left(times, cutoff + 1)
+        if i < len(times):
+            out[key] = (times[i:], values[i:])
+    return out
+
+
+def _build_items(
+    families: list[str], series: dict[str, dict], mode: str, points: int | None, periods: tuple = ()
+) -> list[dict]:
+    items = []
+    for family in families:
+        if mode == "summary":
+            items.extend(_summary_items(family, series[family]))
+        else:
+            items.extend(_full_items(family, series[family], periods))
+    if mode == "chart":
+        for item in items:
+            item["series"] = item["series"].downsample(points)
+    return items
+
+
+async def list_instance_metrics(project_id: str, token: str, days: int = 30, *, resolution: str = "full") -> list[dict]:
+    """
+    Fetch CPU (and if available, memory) time-series for all Compute Engine instances.
+    Returns one entry per instance with metrics array: [{ timestamp, cpu_percent, ram_percent }]
+    (full, or at most N LTTB-picked points for chart:N) or an avg/peak/p50/p95/p99 summary (summary).
+    """
+    return serialize_metrics(await collect_metrics(project_id, token, ["vm"], days, resolution))
+
+
+async def list_cloud_run_metrics(
+    project_id: str, token: str, days: int = 30, *, resolution: str = "full", level: str = "revision"
+) -> list[dict]:
+    """CPU and memory utilization for Cloud Run revisions (services). level=service reduces revisions server-side."""
+    return serialize_metrics(await collect_metrics(project_id, token, [run_family(level)], days, resolution))
+
+
+async def list_cloud_sql_metrics(project_id: str, token: str, days: int = 30, *, resolution: str = "full") -> list[dict]:
+    """CPU and memory utilization for Cloud SQL instances."""
+    return serialize_metrics(await collect_metrics(project_id, token, ["cloud_sql"], days, resolution))
+
+
+async def list_gke_metrics(
+    project_id: str, token: str, days: int = 30, *, resolution: str = "full", level: str = "container"
+) -> list[dict]:
+    """
+    CPU and memory limit utilization for GKE containers. level=workload / namespace / cluster
+    reduces containers server-side (mean of means, max of peaks).
+    """
+    return serialize_metrics(await collect_metrics(project_id, token, [gke_family(level)], days, resolution))
@@ -4,50 +4,200 @@ single response shaped for the dashboard. All utilization and highlight logic li
 
 Future: requested vs used, trend, request count, cost-based waste score.
 """
-# Thresholds for utilization_status (can be made configurable later)
+from providers.gcp.monitoring import percentile_fields
+from utils.timing import span
+
+# Thresholds for utilization_status (can be made configurable later). Compared against p95
+# (sustained load) when available, so a single spike no longer decides the status; avg otherwise.
 OVER_PROVISIONED_CPU_PCT = 5
 OVER_PROVISIONED_RAM_PCT = 10
 UNDER_PROVISIONED_CPU_PCT = 80
 UNDER_PROVISIONED_RAM_PCT = 90
+# A running VM / Cloud SQL instance whose p95 (else peak) CPU stays below this is flagged as idle waste.
+IDLE_CPU_PCT = 2
+
+# Metric family → (compute.py resource_type, metric item → inventory id/name/self-link).
+_INVENTORY_KEYS = {
+    "vm": ("vm", lambda m: m["id"]),
+    "cloud_sql": ("cloud-sql", lambda m: m["name"]),
+    "cloud_run": ("cloud-run", lambda m: m["id"].split("/")[1]),
+    "cloud_run_service": ("cloud-run", lambda m: m["name"]),
+    "gke_cluster": ("gke-cluster", lambda m: m["name"]),
+    # Keys are location/cluster/…: containers, workloads and namespaces join to their cluster.
+    "gke_container": ("gke-cluster", lambda m: m["id"].split("/")[1]),
+    "gke_workload": ("gke-cluster", lambda m: m["id"].split("/")[1]),
+    "gke_namespace": ("gke-cluster", lambda m: m["id"].split("/")[1]),
+}
+# Families whose items are parts of the inventory entry they join to: they get its compute_id,
+# but their utilization is not the entry's, so it is left as is.
+_PART_FAMILIES = {"gke_container", "gke_workload", "gke_namespace"}
+_IDLE_ACTIONS = {
+    "vm": "Stop or delete the idle VM",
+    "cloud-sql": "Stop or delete the idle instance",
+}
+_UTILIZATION_FIELDS = (
+    "avg_cpu_percent", "p95_cpu_percent", "peak_cpu_percent",
+    "avg_ram_percent", "p95_ram_percent", "peak_ram_percent",
+    "utilization_status",
+)
+
+
+class ResourceIndex:
+    """Compute inventory indexed by (resource_type, id | name | self-link), built once per overview."""
+
+    def __init__(self, compute: list[dict]):
+        self._entries: dict[tuple[str, str], dict] = {}
+        for entry in compute:
+            resource_type = entry.get("resource_type", "")
+            for key in (entry.get("id"), entry.get("name"), entry.get("self_link")):
+                if key:
+                    self._entries.setdefault((resource_type, str(key)), entry)
+
+    def get(self, resource_type: str, key: str) -> dict | None:
+        return self._entries.get((resource_type, key))
+
+    def for_metric(self, item: dict) -> dict | None:
+        """The inventory entry a metric item describes (or belongs to), if its family maps to one."""
+        target = _INVENTORY_KEYS.get(item.get("resource_type", ""))
+        if target is None:
+            return None
+        resource_type, key_of = target
+        try:
+            return self.get(resource_type, key_of(item))
+        except (KeyError, IndexError):
+            return None
 
 
 def _enhance_metrics(metrics_list: list[dict]) -> tuple[list[dict], int, int]:
     """
-    Compute avg, peak, and utilization_status per metric item.
+    Compute avg, peak, p50/p95/p99, and utilization_status per metric item (summary dict or
+    columnar series), serializing any series to the JSON point list on the way out.
     Returns (metrics_enhanced, over_provisioned_count, under_provisioned_count).
     """
     over_provisioned = 0
     under_provisioned = 0
     enhanced = []
     for item in metrics_list:
-        points = item.get("metrics") or []
-        cpus = [p["cpu_percent"] for p in points if p.get("cpu_percent") is not None]
-        rams = [p["ram_percent"] for p in points if p.get("ram_percent") is not None]
-        avg_cpu = sum(cpus) / len(cpus) if cpus else None
-        avg_ram = sum(rams) / len(rams) if rams else None
-        peak_cpu = max(cpus) if cpus else None
-        peak_ram = max(rams) if rams else None
-
-        if avg_cpu is not None and avg_cpu < OVER_PROVISIONED_CPU_PCT and (avg_ram is None or avg_ram < OVER_PROVISIONED_RAM_PCT):
+        summary = item.get("summary")
+        series = None
+        if summary:
+            # Summary-resolution items: avg/peak were reduced at collection, percentiles come from the sketches.
+            avg_cpu = summary.get("avg_cpu_percent")
+            avg_ram = summary.get("avg_ram_percent")
+            peak_cpu = summary.get("peak_cpu_percent")
+            peak_ram = summary.get("peak_ram_percent")
+            sketches = item["sketches"]
+            percentiles = percentile_fields(sketches["cpu"], sketches["ram"])
+        else:
+            series = item["series"]
+            avg_cpu = series.avg("cpu")
+            avg_ram = series.avg("ram")
+            peak_cpu = series.peak("cpu")
+            peak_ram = series.peak("ram")
+            percentiles = percentile_fields(series.sketch("cpu"), series.sketch("ram"))
+
+        cpu = _first_known(percentiles.get("p95_cpu_percent"), avg_cpu)
+        ram = _first_known(percentiles.get("p95_ram_percent"), avg_ram)
+        if cpu is not None and cpu < OVER_PROVISIONED_CPU_PCT and (ram is None or ram < OVER_PROVISIONED_RAM_PCT):
             utilization_status = "over_provisioned"
             over_provisioned += 1
-        elif (avg_cpu is not None and avg_cpu > UNDER_PROVISIONED_CPU_PCT) or (avg_ram is not None and avg_ram > UNDER_PROVISIONED_RAM_PCT):
+        elif (cpu is not None and cpu > UNDER_PROVISIONED_CPU_PCT) or (ram is not None and ram > UNDER_PROVISIONED_RAM_PCT):
             utilization_status = "under_provisioned"
             under_provisioned += 1
         else:
             utilization_status = "ok"
 
         enhanced.append({
-            **item,
+            **{k: v for k, v in item.items() if k not in ("summary", "series", "sketches")},
+            "metrics": series.to_points() if series is not None else [],
             "avg_cpu_percent": round(avg_cpu, 2) if avg_cpu is not None else None,
             "avg_ram_percent": round(avg_ram, 2) if avg_ram is not None else None,
             "peak_cpu_percent": round(peak_cpu, 2) if peak_cpu is not None else None,
             "peak_ram_percent": round(peak_ram, 2) if peak_ram is not None else None,
+            **percentiles,
             "utilization_status": utilization_status,
         })
     return enhanced, over_provisioned, under_provisioned
 
 
+def _first_known(*values):
+    return next((v for v in values if v is not None), None)
+
+
+def _sizing_usage(item: dict, column: str) -> tuple[str, float] | None:
+    """(label, value) of the p95 for cpu / ram, else the peak; None when neither is known (never the avg)."""
+    for label in ("p95", "peak"):
+        value = item.get(f"{label}_{column}_percent")
+        if value is not None:
+            return label, value
+    return None
+
+
+def join_metrics(compute: list[dict], metrics_list: list[dict]) -> dict:
+    """
+    Enhance metric items and join them to the inventory through a ResourceIndex: matched compute
+    entries get a "utilization" block (and metric items a "compute_id"; GKE container / workload /
+    namespace items only get their cluster's), and running VMs / Cloud
+    SQL instances idle by p95 (else peak) CPU become waste_reason "idle"; other running VMs that fit a cheaper
+    machine type get a resize recommended_action and estimated_savings. Mutates compute in place, so call
+    it before potential savings are computed. Returns the metrics part for build_overview.
+    """
+    with span("overview-join"):
+        metrics_enhanced, over_provisioned, under_provisioned = _enhance_metrics(metrics_list)
+        index = ResourceIndex(compute)
+        for item in metrics_enhanced:
+            entry = index.for_metric(item)
+            if entry is None:
+                continue
+            item["compute_id"] = entry.get("id", "")
+            if item.get("resource_type") in _PART_FAMILIES:
+                continue
+            entry["utilization"] = {field: item.get(field) for field in _UTILIZATION_FIELDS}
+            _flag_idle(entry, item)
+            _recommend_resize(entry, item)
+    return {
+        "metrics": metrics_enhanced,
+        "over_provisioned": over_provisioned,
+        "under_provisioned": under_provisioned,
+    }
+
+
+def _flag_idle(entry: dict, item: dict) -> None:
+    action = _IDLE_ACTIONS.get(entry.get("resource_type", ""))
+    if action is None or entry.get("waste_reason") not in (None, "", "none"):
+        return
+    cpu = _sizing_usage(item, "cpu")
+    if cpu is None or cpu[1] >= IDLE_CPU_PCT:
+        return
+    entry["status"] = "waste"
+    entry["waste_reason"] = "idle"
+    entry["recommended_action"] = f"{action} ({cpu[0]} CPU {cpu[1]}%)"
+
+
+def _recommend_resize(entry: dict, item: dict) -> None:
+    """Rightsize a running, non-wasted VM from its p95 (else peak) CPU / RAM; copied onto the metric item."""
+    if entry.get("resource_type") != "vm" or entry.get("vm_status") != "RUNNING":
+        return
+    if entry.get("waste_reason") not in (None, "", "none"):
+        return
+    from providers.gcp.pricing import CURRENCY
+    from providers.gcp.rightsizing import recommend
+
+    cpu = _sizing_usage(item, "cpu")
+    if cpu is None:
+        return
+    ram = _sizing_usage(item, "ram")
+    rec = recommend(entry.get("machine_type", ""), entry.get("region", ""), cpu[1], ram[1] if ram else None)
+    if rec is None:
+        return
+    usage = f"{cpu[0]} CPU {cpu[1]}%" + (f", {ram[0]} RAM {ram[1]}%" if ram else "")
+    entry["recommended_action"] = f"Resize {entry.get('machine_type')} to {rec['machine_type']} ({usage})"
+    entry["recommended_machine_type"] = rec["machine_type"]
+    entry["estimated_savings"] = {"value": rec["monthly_savings"], "currency": CURRENCY, "source": "price_table"}
+    item["recommended_action"] = entry["recommended_action"]
+    item["estimated_savings"] = entry["estimated_savings"]
+
+
 def _waste_count(compute: list[dict]) -> int:
     """Count compute resources with waste_reason != 'none'."""
     return sum(1 for r in compute if r.get("waste_reason") and r.get("waste_reason") != "none")
@@ -75,15 +225,61 @@ def _build_summary_cards(summary: dict, billing: dict) -> list[dict]:
     ]
 
 
+def _attach_estimated_savings(compute: list[dict], billing: dict) -> dict | None:
+    """
+    Set estimated_savings (monthly) on each wasted compute entry: the BigQuery export's
+    savable_amount when billing has one for it, else a Recommender API projection already on
+    the entry, else the embedded price table's estimate. Returns a potential_savings built from
+    those estimates (same currency only) for billing when the export gave none.
+    """
+    from providers.gcp.pricing import CURRENCY, PRICE_TABLE_VERSION, estimate_savings
+
+    potential = billing.get("potential_savings") or {}
+    actual = {r["id"]: r["savable_amount"] for r in potential.get("by_resource", [])}
+    estimates = estimate_savings(compute)
+    by_resource = []
+    for r in compute:
+        rid = r.get("id", "")
+        if rid in actual:
+            r["estimated_savings"] = {"value": actual[rid], "currency": potential.get("currency", CURRENCY), "source": "billing_export"}
+            continue
+        if r.get("waste_reason") in (None, "", "none"):
+            continue
+        if (r.get("estimated_savings") or {}).get("source") != "recommender" and rid in estimates:
+            r["estimated_savings"] = {"value": estimates[rid], "currency": CURRENCY, "source": "price_table"}
+        saving = r.get("estimated_savings")
+        if saving and saving["currency"] == CURRENCY:
+            by_resource.append({
+                "id": rid,
+                "name": r.get("name", ""),
+                "reason": r.get("waste_reason", ""),
+                "savable_amount": saving["value"],
+                "source": saving["source"],
+            })
+    if potential or not by_resource:
+        return None
+    return {
+        "value": round(sum(r["savable_amount"] for r in by_resource), 2),
+        "currency": CURRENCY,
+        "by_resource": by_resource,
+        "source": "+".join(sorted({r["source"] for r in by_resource})),
+        "price_table_version": PRICE_TABLE_VERSION,
+    }
+
+
 def _build_highlights(compute: list[dict], metrics_enhanced: list[dict]) -> list[dict]:
     """
     Short list of items to show in a dashboard highlights/alerts strip.
-    Combines compute waste (stopped, unattached, …) and metrics over/under-provisioned.
+    Combines compute waste (stopped, unattached, idle, …), metrics over/under-provisioned and
+    machine-type recommendations; each resource is listed once.
     """
     highlights = []
+    wasted = set()
+    resized = {r.get("id", ""): r for r in compute if r.get("recommended_machine_type")}
     for r in compute:
         reason = r.get("waste_reason")
         if reason and reason != "none":
+            wasted.add(r.get("id", ""))
             highlights.append({
                 "type": "waste",
                 "resource_type": r.get("resource_type", ""),
@@ -93,9 +289,11 @@ def _build_highlights(compute: list[dict], metrics_enhanced: list[dict]) -> list
                 "status": r.get("status", ""),
                 "recommended_action": r.get("recommended_action", ""),
             })
+            if r.get("estimated_savings"):
+                highlights[-1]["estimated_savings"] = r["estimated_savings"]
     for m in metrics_enhanced:
         status = m.get("utilization_status")
-        if status in ("over_provisioned", "under_provisioned"):
+        if status in ("over_provisioned", "under_provisioned") and m.get("compute_id") not in wasted:
             highlights.append({
                 "type": "utilization",
                 "resource_type": m.get("resource_type", ""),
@@ -104,19 +302,44 @@ def _build_highlights(compute: list[dict], metrics_enhanced: list[dict]) -> list
                 "reason": status,
                 "avg_cpu_percent": m.get("avg_cpu_percent"),
                 "avg_ram_percent": m.get("avg_ram_percent"),
+                "p95_cpu_percent": m.get("p95_cpu_percent"),
+                "p95_ram_percent": m.get("p95_ram_percent"),
+            })
+            entry = resized.pop(m.get("compute_id"), None)
+            if entry is not None:
+                highlights[-1]["recommended_action"] = entry.get("recommended_action", "")
+                highlights[-1]["estimated_savings"] = entry.get("estimated_savings")
+    # Rightsizing without a utilization highlight (e.g. from the Recommender API, or status "ok").
+    for r in resized.values():
+        if r.get("id", "") not in wasted:
+            highlights.append({
+                "type": "rightsizing",
+                "resource_type": r.get("resource_type", ""),
+                "id": r.get("id", ""),
+                "name": r.get("name", ""),
+                "reason": "rightsizing",
+                "recommended_action": r.get("recommended_action", ""),
+                "estimated_savings": r.get("estimated_savings"),
             })
     return highlights
 
 
-def build_overview(compute: list[dict], metrics_list: list[dict], billing: dict) -> dict:
+def build_overview(compute: list[dict], joined: dict, billing: dict) -> dict:
     """
-    Build the full dashboard payload from raw compute, metrics, and billing.
+    Build the full dashboard payload from compute, join_metrics() output, and billing.
     Response is shaped for the frontend: summary_cards, highlights, compute, metrics, billing.
+    Wasted resources carry estimated_savings; without a billing export, potential_savings is
+    estimated from the embedded price table.
     """
-    metrics_enhanced, over_provisioned, under_provisioned = _enhance_metrics(metrics_list)
-    summary = _build_summary(compute, metrics_enhanced, over_provisioned, under_provisioned)
-    summary_cards = _build_summary_cards(summary, billing)
-    highlights = _build_highlights(compute, metrics_enhanced)
+    with span("overview-build"):
+        metrics_enhanced = joined["metrics"]
+        over_provisioned, under_provisioned = joined["over_provisioned"], joined["under_provisioned"]
+        fallback = _attach_estimated_savings(compute, billing)
+        if fallback is not None:
+            billing = {**billing, "potential_savings": fallback}
+        summary = _build_summary(compute, metrics_enhanced, over_provisioned, under_provisioned)
+        summary_cards = _build_summary_cards(summary, billing)
+        highlights = _build_highlights(compute, metrics_enhanced)
 
     return {
         "summary": summary,
@@ -0,0 +1,266 @@
+"""
+Embedded GCP list prices for savings estimates when there is no billing export.
+
+On-demand USD list prices for us-central1 (rounded), scaled by a per-region
+multiplier. The raw tables below are compiled on first use into flat dicts, so
+each lookup is O(1) and the module costs nothing until an overview needs it.
+Bump PRICE_TABLE_VERSION whenever the numbers change: it is reported next to
+every estimate built from the table.
+"""
+from functools import lru_cache
+
+PRICE_TABLE_VERSION = "2025-01"
+CURRENCY = "USD"
+HOURS_PER_MONTH = 730
+
+# Machine family → (USD per vCPU-hour, USD per GB-hour).
+_MACHINE_FAMILY_RATES = {
+    "e2": (0.021811, 0.002923),
+    "n1": (0.031611, 0.004237),
+    "n2": (0.031611, 0.004237),
+    "n2d": (0.027502, 0.003686),
+    "n4": (0.030200, 0.003570),
+    "t2d": (0.027502, 0.003686),
+    "c2": (0.033982, 0.004555),
+    "c2d": (0.029563, 0.003959),
+    "c3": (0.034650, 0.004640),
+    "c3d": (0.029563, 0.003959),
+    "m1": (0.034806, 0.005101),
+}
+# Predefined class → family → GB of memory per vCPU.
+_MEMORY_PER_VCPU = {
+    "standard": {"e2": 4, "n1": 3.75, "n2": 4, "n2d": 4, "n4": 4, "t2d": 4, "c2": 4, "c2d": 4, "c3": 4, "c3d": 4},
+    "highmem": {"e2": 8, "n1": 6.5, "n2": 8, "n2d": 8, "n4": 8, "c2d": 8, "c3": 8, "c3d": 8},
+    "highcpu": {"e2": 1, "n1": 0.9, "n2": 1, "n2d": 1, "n4": 2, "c2d": 2, "c3": 2, "c3d": 2},
+}
+# Shared-core machine types → (fractional vCPUs billed, GB); f1 / g1 have flat hourly prices.
+_SHARED_CORE = {"e2-micro": (0.25, 1), "e2-small": (0.5, 2), "e2-medium": (1, 4)}
+_FLAT_HOURLY = {"f1-micro": 0.0076, "g1-small": 0.0257}
+
+# Persistent disk type → USD per GB-month.
+_DISK_GB_MONTH = {
+    "pd-standard": 0.04,
+    "pd-balanced": 0.10,
+    "pd-ssd": 0.17,
+    "pd-extreme": 0.125,
+    "hyperdisk-balanced": 0.08,
+    "hyperdisk-throughput": 0.05,
+    "hyperdisk-extreme": 0.125,
+}
+# Reserved external IP not attached to anything.
+STATIC_IP_HOURLY = 0.01
+
+# Cloud SQL (Enterprise edition): per vCPU-hour / GB-hour, shared-core tiers, storage per GB-month.
+_SQL_VCPU_HOURLY = 0.0413
+_SQL_GB_HOURLY = 0.007
+_SQL_FLAT_HOURLY = {"db-f1-micro": 0.0105, "db-g1-small": 0.035}
+_SQL_MEMORY_PER_VCPU = {"standard": 3.75, "highmem": 6.5}
+_SQL_STORAGE_GB_MONTH = {"PD_SSD": 0.17, "PD_HDD": 0.09}
+
+# Region → price relative to us-central1; unknown regions use 1.0.
+_REGION_MULTIPLIERS = {
+    "us-central1": 1.0, "us-east1": 1.0, "us-west1": 1.0, "us-east4": 1.126, "us-east5": 1.0,
+    "us-south1": 1.18, "us-west2": 1.2, "us-west3": 1.2, "us-west4": 1.126,
+    "northamerica-northeast1": 1.1, "northamerica-northeast2": 1.1, "southamerica-east1": 1.59,
+    "europe-west1": 1.1, "europe-west2": 1.21, "europe-west3": 1.21, "europe-west4": 1.1,
+    "europe-west6": 1.34, "europe-west9": 1.16, "europe-north1": 1.1, "europe-central2": 1.29,
+    "europe-southwest1": 1.18, "asia-east1": 1.16, "asia-east2": 1.37, "asia-northeast1": 1.29,
+    "asia-northeast3": 1.29, "asia-south1": 1.2, "asia-southeast1": 1.23, "asia-southeast2": 1.35,
+    "australia-southeast1": 1.41, "me-west1": 1.2,
+}
+# Predefined vCPU counts per (family, class); classes don't all come in the same sizes
+# (e.g. there is no n1-highmem-1 or e2-highmem-32). Custom shapes are priced on the fly.
+_N1_SIZES = (2, 4, 8, 16, 32, 64, 96)
+_N2_SIZES = (2, 4, 8, 16, 32, 48, 64, 80, 96)
+_N4_SIZES = (2, 4, 8, 16, 32, 48, 64, 80)
+_C2D_SIZES = (2, 4, 8, 16, 32, 56, 112)
+_C3_SIZES = (4, 8, 22, 44, 88, 176)
+_C3D_SIZES = (4, 8, 16, 30, 60, 90, 180, 360)
+_CLASS_VCPUS = {
+    ("e2", "standard"): (2, 4, 8, 16, 32),
+    ("e2", "highmem"): (2, 4, 8, 16),
+    ("e2", "highcpu"): (2, 4, 8, 16, 32),
+    ("n1", "standard"): (1, *_N1_SIZES),
+    ("n1", "highmem"): _N1_SIZES,
+    ("n1", "highcpu"): _N1_SIZES,
+    ("n2", "standard"): (*_N2_SIZES, 128),
+    ("n2", "highmem"): (*_N2_SIZES, 128),
+    ("n2", "highcpu"): _N2_SIZES,
+    ("n2d", "standard"): (*_N2_SIZES, 128, 224),
+    ("n2d", "highmem"): _N2_SIZES,
+    ("n2d", "highcpu"): (*_N2_SIZES, 128, 224),
+    ("n4", "standard"): _N4_SIZES,
+    ("n4", "highmem"): _N4_SIZES,
+    ("n4", "highcpu"): _N4_SIZES,
+    ("t2d", "standard"): (1, 2, 4, 8, 16, 32, 48, 60),
+    ("c2", "standard"): (4, 8, 16, 30, 60),
+    ("c2d", "standard"): _C2D_SIZES,
+    ("c2d", "highmem"): _C2D_SIZES,
+    ("c2d", "highcpu"): _C2D_SIZES,
+    ("c3", "standard"): _C3_SIZES,
+    ("c3", "highmem"): _C3_SIZES,
+    ("c3", "highcpu"): _C3_SIZES,
+    ("c3d", "standard"): _C3D_SIZES,
+    ("c3d", "highmem"): _C3D_SIZES,
+    ("c3d", "highcpu"): _C3D_SIZES,
+}
+
+
+@lru_cache(maxsize=1)
+def _table() -> dict:
+    """The raw tables compiled into flat lookups (built once, on first use)."""
+    machines = {}
+    for (family, machine_class), sizes in _CLASS_VCPUS.items():
+        per_vcpu = _MEMORY_PER_VCPU[machine_class][family]
+        vcpu_rate, gb_rate = _MACHINE_FAMILY_RATES[family]
+        for vcpus in sizes:
+            machines[f"{family}-{machine_class}-{vcpus}"] = vcpus * (vcpu_rate + per_vcpu * gb_rate)
+    e2_vcpu, e2_gb = _MACHINE_FAMILY_RATES["e2"]
+    machines.update({name: vcpus * e2_vcpu + gb * e2_gb for name, (vcpus, gb) in _SHARED_CORE.items()})
+    machines.update(_FLAT_HOURLY)
+    return {"machine": machines, "disk": _DISK_GB_MONTH, "region": _REGION_MULTIPLIERS}
+
+
+@lru_cache(maxsize=1)
+def machine_catalog() -> dict[str, list[tuple[str, float, float, float]]]:
+    """
+    Predefined machine types per family as (name, vCPUs, GB, us-central1 USD/hour), grouped by
+    family and sorted by price. Shared-core e2 types are in "e2" with their billed vCPU fraction.
+    """
+    catalog: dict[str, list] = {}
+    machines = _table()["machine"]
+    for name in machines:
+        shape = machine_shape(name)
+        if shape is not None:
+            family, vcpus, gb = shape
+            catalog.setdefault(family, []).append((name, vcpus, gb, machines[name]))
+    for types in catalog.values():
+        types.sort(key=lambda t: (t[3], t[0]))
+    return catalog
+
+
+def region_of(location: str) -> str:
+    """Region of a zone ("us-central1-a") or region name."""
+    parts = (location or "").split("-")
+    return "-".join(parts[:2]) if len(parts) > 2 else location or ""
+
+
+def region_multiplier(location: str) -> float:
+    return _table()["region"].get(region_of(location), 1.0)
+
+
+@lru_cache(maxsize=512)
+def machine_shape(machine_type: str) -> tuple[str, float, float] | None:
+    """(family, vCPUs, GB) of a predefined or custom machine type, None if unknown."""
+    if machine_type in _SHARED_CORE:
+        return ("e2", *_SHARED_CORE[machine_type])
+    parts = machine_type.split("-")
+    if parts[-1] == "ext":
+        parts = parts[:-1]
+    if parts[0] == "custom":
+        parts = ["n1", *parts]
+    if len(parts) == 4 and parts[1] == "custom" and parts[0] in _MACHINE_FAMILY_RATES:
+        try:
+            return parts[0], float(parts[2]), int(parts[3]) / 1024
+        except ValueError:
+            return None
+    if len(parts) == 3 and parts[0] in _MACHINE_FAMILY_RATES and parts[2].isdigit():
+        per_vcpu = _MEMORY_PER_VCPU.get(parts[1], {}).get(parts[0])
+        if per_vcpu is not None:
+            return parts[0], float(parts[2]), int(parts[2]) * per_vcpu
+    return None
+
+
+def machine_hourly(machine_type: str, location: str) -> float | None:
+    """On-demand USD per hour for a machine type in a zone / region, None if not in the table."""
+    flat = _table()["machine"].get(machine_type)
+    if flat is None:
+        shape = machine_shape(machine_type or "")
+        if shape is None:
+            return None
+        family, vcpus, gb = shape
+        vcpu_rate, gb_rate = _MACHINE_FAMILY_RATES[family]
+        flat = vcpus * vcpu_rate + gb * gb_rate
+    return flat * region_multiplier(location)
+
+
+def disk_monthly(disk_type: str, size_gb: float, location: str) -> float | None:
+    rate = _table()["disk"].get(disk_type)
+    if rate is None or not size_gb:
+        return None
+    return rate * size_gb * region_multiplier(location)
+
+
+def static_ip_monthly() -> float:
+    return STATIC_IP_HOURLY * HOURS_PER_MONTH
+
+
+def sql_hourly(tier: str, location: str) -> float | None:
+    """Cloud SQL instance (tier) USD per hour: db-f1-micro, db-g1-small, db-custom-N-MB, db-n1-standard|highmem-N."""
+    flat = _SQL_FLAT_HOURLY.get(tier)
+    if flat is None:
+        parts = (tier or "").split("-")
+        try:
+            if len(parts) == 4 and parts[1] == "custom":
+                vcpus, gb = float(parts[2]), int(parts[3]) / 1024
+            elif len(parts) == 4 and parts[1] == "n1" and parts[2] in _SQL_MEMORY_PER_VCPU:
+                vcpus = float(parts[3])
+                gb = vcpus * _SQL_MEMORY_PER_VCPU[parts[2]]
+            else:
+                return None
+        except ValueError:
+            return None
+        flat = vcpus * _SQL_VCPU_HOURLY + gb * _SQL_GB_HOURLY
+    return flat * region_multiplier(location)
+
+
+def sql_storage_monthly(disk_type: str, size_gb, location: str) -> float | None:
+    rate = _SQL_STORAGE_GB_MONTH.get(disk_type)
+    try:
+        size = float(size_gb or 0)
+    except (TypeError, ValueError):
+        return None
+    if rate is None or not size:
+        return None
+    return rate * size * region_multiplier(location)
+
+
+def estimate_savings(compute: list[dict]) -> dict[str, float]:
+    """
+    Monthly USD saved by acting on each wasted resource, by compute id (resources the table
+    can't price are left out):
+    unattached disk → its storage; unused IP → the reservation; idle VM → the machine;
+    stopped VM → the disks attached to it (a stopped VM bills no vCPU / memory);
+    idle Cloud SQL → tier + storage; stopped Cloud SQL → storage.
+    """
+    disks_by_user: dict[str, float] = {}
+    for r in compute:
+        if r.get("resource_type") == "disk" and r.get("attached_to"):
+            cost = disk_monthly(r.get("disk_type", ""), r.get("size_gb", 0), r.get("region", ""))
+            if cost:
+                disks_by_user[r["attached_to"]] = disks_by_user.get(r["attached_to"], 0.0) + cost
+
+    out = {}
+    for r in compute:
+        reason = r.get("waste_reason")
+        if not reason or reason == "none":
+            continue
+        resource_type = r.get("resource_type")
+        region = r.get("region", "")
+        cost = None
+        if resource_type == "disk":
+            cost = disk_monthly(r.get("disk_type", ""), r.get("size_gb", 0), region)
+        elif resource_type == "ip":
+            cost = static_ip_monthly()
+        elif resource_type == "vm" and reason == "stopped":
+            cost = disks_by_user.get(r.get("self_link", ""))
+        elif resource_type == "vm":
+            hourly = machine_hourly(r.get("machine_type", ""), region)
+            cost = hourly * HOURS_PER_MONTH if hourly is not None else None
+        elif resource_type == "cloud-sql":
+            storage = sql_storage_monthly(r.get("disk_type", ""), r.get("disk_size_gb"), region) or 0.0
+            hourly = sql_hourly(r.get("tier", ""), region) if reason != "stopped" else None
+            cost = storage + (hourly * HOURS_PER_MONTH if hourly is not None else 0.0)
+        if cost:
+            out[r.get("id", "")] = round(cost, 2)
+    return out
@@ -16,13 +16,26 @@ from providers.gcp.compute import (
     list_gke_clusters,
 )
 from providers.gcp.monitoring import (
-    list_instance_metrics,
-    list_cloud_run_metrics,
-    list_cloud_sql_metrics,
-    list_gke_metrics,
+    GKE_LEVELS,
+    MAX_DAYS,
+    RUN_LEVELS,
+    collect_metrics,
+    gke_family,
+    inventory_ids,
+    parse_resolution,
+    run_family,
+    serialize_metrics,
 )
-from providers.gcp.billing import get_project_billing_info
-from providers.gcp.overview import build_overview
+from providers.gcp.billing import get_project_billing_info, get_projects_billing_info
+from providers.gcp.overview import build_overview, join_metrics
+from providers.gcp.recommender import DETECTION_MODES, list_recommendations, merge_recommendations
+from services.cache_service import CacheService
+from services.metrics_store import MetricsStore
+from utils.timing import span
+
+# The overview needs avg/peak/p95 per workload (window-aligned peaks, 6-hourly means through a
+# sketch, or the stored hourly means); GKE reduced to workloads, Cloud Run to services.
+OVERVIEW_METRICS = {"resolution": "summary", "gke_level": "workload", "run_level": "service"}
 
 
 class GCPProvider(CloudProvider):
@@ -34,19 +47,22 @@ class GCPProvider(CloudProvider):
 
     BASE = "https://cloudresourcemanager.googleapis.com"
 
-    def __init__(self, credentials: dict):
+    def __init__(self, credentials: dict, env=None, ctx=None):
         self._creds = credentials
         self._project_id = credentials.get("project_id", "")
         self._auth = GCPAuthService(credentials)
+        self._metrics_store = MetricsStore(env)
+        self._cache = CacheService(env, ctx)
 
     async def get_projects(self) -> list[dict]:
         """List GCP projects accessible with these credentials."""
         token = await self._auth.get_access_token()
-        resp = await js.fetch(
-            f"{self.BASE}/v1/projects",
-            to_js({"headers": {"Authorization": f"Bearer {token}"}}, dict_converter=js.Object.fromEntries),
-        )
-        data = json.loads(await resp.text())
+        with span("resource-manager"):
+            resp = await js.fetch(
+                f"{self.BASE}/v1/projects",
+                to_js({"headers": {"Authorization": f"Bearer {token}"}}, dict_converter=js.Object.fromEntries),
+            )
+            data = json.loads(await resp.text())
         projects = data.get("projects", [])
         return [
             {"id": p["projectId"], "name": p.get("name", p["projectId"]), "provider": "gcp"}
@@ -73,23 +89,36 @@ class GCPProvider(CloudProvider):
         gke = await list_gke_clusters(pid, token)
         return vms + disks + ips + cloud_run + cloud_sql + storage + functions + load_balancers + bigquery + gke
 
-    async def get_metrics(self, request, project_id: str | None = None) -> list[dict]:
-        """Return CPU / RAM time-series for GCE VMs, Cloud Run, Cloud SQL, and GKE (last 30 days by default)."""
+    async def get_metrics(self, request, project_id: str | None = None, **overrides) -> list[dict]:
+        """
+        Return CPU / RAM time-series for GCE VMs, Cloud Run, Cloud SQL, and GKE (last 30 days by default).
+        Query: ?days=, ?resolution=full|summary|chart:N, ?gke_level=container|workload|namespace|cluster,
+        ?run_level=revision|service, ?ids=a,b,… (instance ids, Cloud Run service names, Cloud SQL
+        database ids, GKE cluster names — only those series are fetched).
+        Keyword overrides (same names) win over the query.
+        """
+        return serialize_metrics(await self._collect_metrics(request, project_id, **overrides))
+
+    async def _collect_metrics(
+        self, request, project_id: str | None = None, inventory: list[dict] | None = None, **overrides
+    ) -> list[dict]:
+        """
+        Metric items with columnar series (not yet JSON-shaped); see get_metrics for options.
+        With an inventory (get_compute output) and no ?ids=, queries are restricted to those resources.
+        """
         pid = project_id or self._project_id
         token = await self._auth.get_access_token()
-        days = 30
-        try:
-            from urllib.parse import parse_qs, urlparse
-            query = parse_qs(urlparse(request.url).query)
-            if "days" in query and query["days"]:
-                days = max(1, min(30, int(query["days"][0])))
-        except (ValueError, IndexError):
-            pass
-        vm = await list_instance_metrics(pid, token, days=days)
-        cloud_run = await list_cloud_run_metrics(pid, token, days=days)
-        cloud_sql = await list_cloud_sql_metrics(pid, token, days=days)
-        gke = await list_gke_metrics(pid, token, days=days)
-        return vm + cloud_run + cloud_sql + gke
+        opts = {**_metrics_query(request), **overrides}
+        families = ["vm", run_family(opts["run_level"]), "cloud_sql", gke_family(opts["gke_level"])]
+        if opts["ids"]:
+            ids = {family: opts["ids"] for family in families}
+        elif inventory is not None:
+            ids = inventory_ids(families, inventory, pid)
+        else:
+            ids = None
+        return await collect_metrics(
+            pid, token, families, days=opts["days"], resolution=opts["resolution"], store=self._metrics_store, ids=ids
+        )
 
     async def get_billing(self, compute: list[dict] | None = None, project_id: str | None = None) -> dict:
         """Return billing account info. Pass compute when building overview to get potential_savings from BigQuery export."""
@@ -100,13 +129,68 @@ class GCPProvider(CloudProvider):
             token,
             credentials=self._creds,
             compute=compute,
+            cache=self._cache,
+        )
+
+    async def get_projects_billing(self, project_ids: list[str]) -> dict:
+        """Billing for several projects at once (?projects=a,b,…): one BigQuery scan per billing account."""
+        token = await self._auth.get_access_token()
+        billing = await get_projects_billing_info(
+            project_ids, token, connection_project_id=self._project_id, credentials=self._creds, cache=self._cache
         )
+        return {"projects": billing}
 
     async def get_overview(self, request, project_id: str | None = None) -> dict:
-        """Single dashboard payload: compute, metrics (with utilization), billing, summary_cards, highlights. Optional project_id scopes to that project."""
+        """
+        Single dashboard payload: compute, metrics (with utilization), billing, summary_cards, highlights.
+        Optional project_id scopes to that project. ?detection=scanners (default) | recommender | both:
+        recommender skips the Monitoring pulls and takes idle / rightsizing findings from the GCP
+        Recommender API; both merges them with our own (one finding per resource).
+        """
         pid = project_id or self._project_id
+        detection = _detection_mode(request)
         compute = await self.get_compute(project_id=pid)
-        metrics_list = await self.get_metrics(request, project_id=pid)
+        metrics_list = []
+        if detection != "recommender":
+            metrics_list = await self._collect_metrics(request, project_id=pid, inventory=compute, **OVERVIEW_METRICS)
+        # Joined before billing so utilization-based waste (idle VMs / SQL) counts toward potential savings.
+        joined = join_metrics(compute, metrics_list)
+        if detection != "scanners":
+            token = await self._auth.get_access_token()
+            merge_recommendations(compute, await list_recommendations(pid, token, compute))
         billing = await self.get_billing(compute=compute, project_id=pid)
-        return build_overview(compute, metrics_list, billing)
+        return build_overview(compute, joined, billing)
+
+
+
+def _detection_mode(request) -> str:
+    """?detection= (one of DETECTION_MODES, default scanners)."""
+    from urllib.parse import parse_qs, urlparse
+    value = (parse_qs(urlparse(request.url).query).get("detection") or [DETECTION_MODES[0]])[0]
+    return value if value in DETECTION_MODES else DETECTION_MODES[0]
+
+
+def _metrics_query(request) -> dict:
+    """Parse ?days= (1–MAX_DAYS, default 30), ?resolution=, ?gke_level=, ?run_level= and ?ids= from the request URL."""
+    from urllib.parse import parse_qs, urlparse
+    query = parse_qs(urlparse(request.url).query)
+    days = 30
+    try:
+        if "days" in query and query["days"]:
+            days = max(1, min(MAX_DAYS, int(query["days"][0])))
+    except (ValueError, IndexError):
+        pass
+
+    resolution = (query.get("resolution") or ["full"])[0]
+
+    def choice(name: str, allowed: tuple[str, ...]) -> str:
+        value = (query.get(name) or [allowed[0]])[0]
+        return value if value in allowed else allowed[0]
 
+    return {
+        "days": days,
+        "resolution": resolution if parse_resolution(resolution) else "full",
+        "gke_level": choice("gke_level", GKE_LEVELS),
+        "run_level": choice("run_level", RUN_LEVELS),
+        "ids": sorted({i.strip() for i in ",".join(query.get("ids", [])).split(",") if i.strip()}) or None,
+    }
@@ -0,0 +1,154 @@
+"""
+GCP Recommender API — idle VM / disk / IP and machine-type recommendations GCP
+already computes, as an alternative (or complement) to our own scanners and
+30-day Monitoring pulls. One paginated list call per recommender and location;
+locations come from the inventory, so only zones / regions with matching
+resources are asked.
+"""
+import asyncio
+from urllib.parse import quote
+
+from providers.gcp.helpers import fetch_gcp_api, parse_resource_url
+
+RECOMMENDER_BASE = "https://recommender.googleapis.com/v1"
+PAGE_SIZE = 500
+DETECTION_MODES = ("scanners", "recommender", "both")
+
+# Recommender id → (compute.py resource_type, waste_reason; None for rightsizing).
+# All are zonal except the address recommender, which is regional (matching "region" in compute.py).
+RECOMMENDERS = {
+    "google.compute.instance.IdleResourceRecommender": ("vm", "idle"),
+    "google.compute.instance.MachineTypeRecommender": ("vm", None),
+    "google.compute.disk.IdleResourceRecommender": ("disk", "idle"),
+    "google.compute.address.IdleResourceRecommender": ("ip", "unused"),
+}
+
+
+async def list_recommendations(project_id: str, token: str, compute: list[dict]) -> list[dict]:
+    """
+    Active recommendations for the inventory's locations, normalized (see _normalize).
+    Recommenders that fail (API disabled, no permission in a location) contribute nothing.
+    """
+    calls = []
+    for recommender, (resource_type, _) in RECOMMENDERS.items():
+        locations = sorted({r.get("region") for r in compute if r.get("resource_type") == resource_type and r.get("region")})
+        calls.extend(_list_pages(project_id, token, location, recommender) for location in locations)
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    return [rec for result in results if not isinstance(result, Exception) for rec in result]
+
+
+async def _list_pages(project_id: str, token: str, location: str, recommender: str) -> list[dict]:
+    url = (
+        f"{RECOMMENDER_BASE}/projects/{project_id}/locations/{location}"
+        f"/recommenders/{recommender}/recommendations?pageSize={PAGE_SIZE}"
+    )
+    out = []
+    page_token = None
+    while True:
+        page_url = f"{url}&pageToken={quote(page_token)}" if page_token else url
+        data = await fetch_gcp_api(page_url, token, "GCP Recommender API", fields=("recommendations", "nextPageToken"))
+        for rec in data.get("recommendations", []):
+            normalized = _normalize(rec, recommender)
+            if normalized is not None:
+                out.append(normalized)
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            return out
+
+
+def _normalize(rec: dict, recommender: str) -> dict | None:
+    """
+    {resource_type, region, name, waste_reason, recommended_action, recommended_machine_type,
+    monthly_savings, currency} for an ACTIVE recommendation, None otherwise. region is the zone
+    (or region for addresses) from the target resource's path.
+    """
+    if (rec.get("stateInfo") or {}).get("state", "ACTIVE") != "ACTIVE":
+        return None
+    resource_type, waste_reason = RECOMMENDERS[recommender]
+    resource = None
+    machine_type = None
+    for group in (rec.get("content") or {}).get("operationGroups", []):
+        for op in group.get("operations", []):
+            resource = resource or op.get("resource")
+            # Machine-type recommendations also "test" the current type; only "replace" holds the new one.
+            if op.get("action") == "replace" and op.get("path") == "/machineType" and op.get("value"):
+                machine_type = parse_resource_url(str(op["value"]))
+    if not resource:
+        return None
+    parts = resource.split("/")
+    if len(parts) < 4:
+        return None
+    monthly, currency = _monthly_savings((rec.get("primaryImpact") or {}).get("costProjection") or {})
+    return {
+        "resource_type": resource_type,
+        "region": parts[-3],
+        "name": parts[-1],
+        "waste_reason": waste_reason,
+        "recommended_action": rec.get("description") or "",
+        "recommended_machine_type": machine_type,
+        "monthly_savings": monthly,
+        "currency": currency,
+    }
+
+
+def _monthly_savings(projection: dict) -> tuple[float | None, str]:
+    """Savings per 30 days from a costProjection (negative cost over duration), and its currency."""
+    cost = projection.get("cost") or {}
+    currency = cost.get("currencyCode") or "USD"
+    try:
+        value = -(int(cost.get("units") or 0) + int(cost.get("nanos") or 0) / 1e9)
+        seconds = float(str(projection.get("duration") or "2592000s").rstrip("s"))
+    except ValueError:
+        return None, currency
+    if value <= 0 or seconds <= 0:
+        return None, currency
+    return round(value * 2592000 / seconds, 2), currency
+
+
+def merge_recommendations(compute: list[dict], recommendations: list[dict]) -> None:
+    """
+    Fold recommendations into compute (in place), one finding per resource. A resource the
+    scanners already flagged (waste, or a resize recommendation) keeps that finding and only
+    gains estimated_savings if it had none; otherwise the recommendation becomes its finding.
+    Recommendations for resources missing from the inventory are appended as compute entries.
+    """
+    index = {(r.get("resource_type"), r.get("region"), r.get("name")): r for r in compute}
+    seen = set()
+    for rec in recommendations:
+        key = (rec["resource_type"], rec["region"], rec["name"])
+        if key in seen:
+            continue
+        seen.add(key)
+        entry = index.get(key)
+        if entry is None:
+            entry = {
+                "id": rec["name"],
+                "name": rec["name"],
+                "provider": "gcp",
+                "resource_type": rec["resource_type"],
+                "region": rec["region"],
+                "status": "healthy",
+                "waste_reason": "none",
+                "recommended_action": "",
+            }
+            compute.append(entry)
+            index[key] = entry
+        savings = None
+        if rec["monthly_savings"]:
+            savings = {"value": rec["monthly_savings"], "currency": rec["currency"], "source": "recommender"}
+        flagged = entry.get("waste_reason") not in (None, "", "none") or entry.get("recommended_machine_type")
+        if flagged:
+            if savings and not entry.get("estimated_savings"):
+                entry["estimated_savings"] = savings
+            continue
+        if rec["waste_reason"]:
+            entry["status"] = "waste"
+            entry["waste_reason"] = rec["waste_reason"]
+        elif rec["recommended_machine_type"]:
+            entry["recommended_machine_type"] = rec["recommended_machine_type"]
+        else:
+            continue
+        entry["recommended_action"] = rec["recommended_action"]
+        entry["detected_by"] = "recommender"
+        if savings:
+            entry["estimated_savings"] = savings
@@ -0,0 +1,70 @@
+"""
+Rightsizing: map a VM's p95 CPU / RAM to the cheapest predefined machine type of
+its family that still fits, using the embedded catalog in pricing.py (no
+machineTypes.list calls).
+
+The catalog is indexed once per family and machine class as parallel vCPU / GB
+columns; within a class both grow with price, so the smallest fitting size is
+one bisect per column and a recommendation costs O(classes · log n).
+"""
+from bisect import bisect_left
+from functools import lru_cache
+
+from providers.gcp.pricing import HOURS_PER_MONTH, machine_catalog, machine_hourly, machine_shape
+
+# Size so the observed p95 lands at or below these utilizations on the new type.
+TARGET_CPU_PCT = 70
+TARGET_RAM_PCT = 80
+# Recommendations saving less than this per month (USD) are not worth the restart.
+MIN_MONTHLY_SAVINGS = 5.0
+
+
+@lru_cache(maxsize=1)
+def _class_index() -> dict[str, list[tuple[list[float], list[float], list[tuple]]]]:
+    """family → [(vCPU column, GB column, types)] per machine class, each sorted by size."""
+    index: dict[str, list] = {}
+    for family, types in machine_catalog().items():
+        by_class: dict[str, list] = {}
+        for machine in types:
+            name = machine[0]
+            machine_class = "shared" if name.count("-") == 1 else name.split("-")[1]
+            by_class.setdefault(machine_class, []).append(machine)
+        index[family] = []
+        for members in by_class.values():
+            members.sort(key=lambda t: (t[1], t[2]))
+            index[family].append(([t[1] for t in members], [t[2] for t in members], members))
+    return index
+
+
+def cheapest_fit(family: str, vcpus: float, gb: float) -> tuple | None:
+    """Cheapest (name, vCPUs, GB, USD/hour) in family with at least vcpus and gb, None if none fits."""
+    best = None
+    for vcpu_column, gb_column, members in _class_index().get(family, ()):
+        i = max(bisect_left(vcpu_column, vcpus), bisect_left(gb_column, gb))
+        if i < len(members) and (best is None or members[i][3] < best[3]):
+            best = members[i]
+    return best
+
+
+def recommend(machine_type: str, location: str, cpu_pct: float | None, ram_pct: float | None) -> dict | None:
+    """
+    {machine_type, monthly_savings} for a VM whose p95 CPU / RAM (% of its current type) would
+    fit a cheaper predefined type of the same family; None if it already fits best or can't be
+    priced. Custom types are sized the same way. Without RAM utilization the current memory is kept.
+    """
+    shape = machine_shape(machine_type or "")
+    if shape is None or cpu_pct is None:
+        return None
+    family, vcpus, gb = shape
+    need_vcpus = vcpus * cpu_pct / TARGET_CPU_PCT
+    need_gb = gb * ram_pct / TARGET_RAM_PCT if ram_pct is not None else gb
+    fit = cheapest_fit(family, need_vcpus, need_gb)
+    if fit is None or fit[0] == machine_type:
+        return None
+    current, proposed = machine_hourly(machine_type, location), machine_hourly(fit[0], location)
+    if current is None or proposed is None:
+        return None
+    savings = (current - proposed) * HOURS_PER_MONTH
+    if savings < MIN_MONTHLY_SAVINGS:
+        return None
+    return {"machine_type": fit[0], "monthly_savings": round(savings, 2)}
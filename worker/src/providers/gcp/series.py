@@ -0,0 +1,206 @@
+"""
+Columnar metric series — epoch-second timestamps plus parallel CPU / RAM value
+arrays (array('d'), NaN = no sample). Collectors build these and the overview
+reduces them in place; the JSON point shape [{timestamp, cpu_percent, ram_percent}]
+is only produced at the edge by to_points(); downsample() applies LTTB for
+chart-sized payloads. NumPy is used for joins and
+reductions when the runtime ships it; otherwise plain array loops.
+"""
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # not bundled with the worker by default
+    np = None
+
+from providers.gcp.sketch import TDigest
+
+NAN = float("nan")
+
+
+@lru_cache(maxsize=8192)
+def epoch_seconds(timestamp: str) -> int:
+    """RFC3339 → epoch seconds. Cached: aligned series share the same few hundred timestamps."""
+    return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+
+
+def iso_timestamp(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def columns(points: list[tuple[str, float]]) -> tuple[array, array]:
+    """[(RFC3339, value), …] in any order → (times, values) sorted by time."""
+    if points and points[0][0] > points[-1][0]:
+        points = points[::-1]  # Monitoring returns newest first
+    if any(points[i][0] > points[i + 1][0] for i in range(len(points) - 1)):
+        points = sorted(points)
+    return array("q", (epoch_seconds(t) for t, _ in points)), array("d", (v for _, v in points))
+
+
+def stitch(parts: list[tuple[array, array]]) -> tuple[array, array]:
+    """Concatenate time-ordered (times, values) chunks, dropping points a later chunk repeats at the boundary."""
+    times, values = array("q"), array("d")
+    for part_times, part_values in parts:
+        skip = 0
+        while skip < len(part_times) and times and part_times[skip] <= times[-1]:
+            skip += 1
+        times.extend(part_times[skip:])
+        values.extend(part_values[skip:])
+    return times, values
+
+
+class Series:
+    """
+    One resource's CPU (and optional RAM) samples on a shared, ascending time axis.
+
+    periods: ((last time, alignment seconds), …) oldest first when the points were aligned
+    at different periods (older chunks are coarser); avg() and sketch() then weight each
+    point by its period so a 6-hour mean counts six times an hourly one. Empty = equal weights.
+    """
+
+    __slots__ = ("times", "cpu", "ram", "periods")
+
+    def __init__(self, times: array, cpu: array, ram: array | None = None, periods: tuple = ()):
+        self.times = times
+        self.cpu = cpu
+        self.ram = ram if ram is not None else array("d", [NAN]) * len(times)
+        self.periods = periods
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def join_ram(self, times: array, values: array) -> None:
+        """Fill RAM at timestamps that exist on the CPU axis (other RAM samples are dropped)."""
+        if not len(times) or not len(self.times):
+            return
+        if np is not None:
+            own = np.frombuffer(self.times, dtype=np.int64)
+            other = np.frombuffer(times, dtype=np.int64)
+            idx = np.searchsorted(own, other).clip(0, len(own) - 1)
+            hit = own[idx] == other
+            ram = np.frombuffer(self.ram, dtype=np.float64).copy()
+            ram[idx[hit]] = np.frombuffer(values, dtype=np.float64)[hit]
+            self.ram = array("d", ram.tobytes())
+            return
+        i, n = 0, len(self.times)
+        for t, v in zip(times, values):
+            while i < n and self.times[i] < t:
+                i += 1
+            if i == n:
+                break
+            if self.times[i] == t:
+                self.ram[i] = v
+
+    def _values(self, column: str) -> array:
+        return self.cpu if column == "cpu" else self.ram
+
+    def _segments(self) -> list[tuple[int, int, float]]:
+        """(start, stop, weight) index ranges sharing one alignment period; weight = period in hours."""
+        if not self.periods:
+            return [(0, len(self.times), 1.0)]
+        segments = []
+        start = 0
+        for n, (last, period) in enumerate(self.periods):
+            stop = len(self.times) if n == len(self.periods) - 1 else bisect_right(self.times, last, start)
+            if stop > start:
+                segments.append((start, stop, period / 3600))
+            start = stop
+        return segments
+
+    def avg(self, column: str) -> float | None:
+        """Mean of the present samples, time-weighted across alignment periods."""
+        values = self._values(column)
+        total = weight = 0.0
+        for start, stop, w in self._segments():
+            if np is not None:
+                vals = _np_present(values[start:stop])
+                part, count = float(vals.sum()), vals.size
+            else:
+                present = [v for v in values[start:stop] if v == v]
+                part, count = sum(present), len(present)
+            total += part * w
+            weight += count * w
+        return total / weight if weight else None
+
+    def peak(self, column: str) -> float | None:
+        if np is not None:
+            vals = _np_present(self._values(column))
+            return float(vals.max()) if vals.size else None
+        present = [v for v in self._values(column) if v == v]
+        return max(present) if present else None
+
+    def downsample(self, points: int) -> "Series":
+        """LTTB-downsample to at most `points` samples, picked on the CPU column (RAM follows)."""
+        if points >= len(self.times):
+            return self
+        idx = lttb_indices(self.times, self.cpu, points)
+        return Series(
+            array("q", (self.times[i] for i in idx)),
+            array("d", (self.cpu[i] for i in idx)),
+            array("d", (self.ram[i] for i in idx)),
+            self.periods,
+        )
+
+    def sketch(self, column: str) -> TDigest:
+        """Quantile sketch of one column: a digest per alignment period, weighted by it, merged."""
+        values = self._values(column)
+        digest = TDigest()
+        for start, stop, w in self._segments():
+            digest.merge(TDigest.of(values[start:stop], weight=w))
+        return digest
+
+    def to_points(self) -> list[dict]:
+        """Edge serialization to the public point shape."""
+        return [
+            {
+                "timestamp": iso_timestamp(t),
+                "cpu_percent": c if c == c else None,
+                "ram_percent": r if r == r else None,
+            }
+            for t, c, r in zip(self.times, self.cpu, self.ram)
+        ]
+
+
+def lttb_indices(times: array, values: array, points: int) -> list[int]:
+    """
+    Largest-Triangle-Three-Buckets: indices of `points` samples that keep the visual shape.
+    First and last samples are always kept; from each bucket in between, the sample forming
+    the largest triangle with the previous pick and the next bucket's average. NaN never wins.
+    """
+    size = len(times)
+    if points >= size:
+        return list(range(size))
+    if points < 3:
+        return [0, size - 1][:max(points, 1)]
+    every = (size - 2) / (points - 2)
+    picked = [0]
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        nxt = range(end, min(int((i + 2) * every) + 1, size))
+        present = [values[j] for j in nxt if values[j] == values[j]]
+        avg_t = sum(times[j] for j in nxt) / len(nxt)
+        avg_v = sum(present) / len(present) if present else 0.0
+        at = times[a]
+        av = values[a] if values[a] == values[a] else 0.0
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            v = values[j]
+            if v != v:
+                continue
+            area = abs((at - avg_t) * (v - av) - (at - times[j]) * (avg_v - av))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    picked.append(size - 1)
+    return picked
+
+
+def _np_present(values: array):
+    vals = np.frombuffer(values, dtype=np.float64)
+    return vals[~np.isnan(vals)]
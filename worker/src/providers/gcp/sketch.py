@@ -0,0 +1,160 @@
+"""
+Mergeable quantile sketch (merging t-digest) for utilization percentiles.
+
+A digest keeps at most ~compression centroids no matter how many points were
+added, so p50/p95/p99 cost bounded memory for any window length. Digests merge
+losslessly enough to combine time chunks or reduced series. Accuracy is best in
+the tails (the k1 scale function gives small centroids near q=0 and q=1), which
+is where rightsizing looks (p95/p99).
+
+Up to EXACT_SAMPLES points the digest keeps the raw samples and its quantiles are
+exact: a centroid that mixes a few outliers with the bulk (one spike among hundreds
+of quiet hours) would otherwise drag p99 far off, and most windows are that small.
+"""
+import math
+
+DEFAULT_COMPRESSION = 100
+EXACT_SAMPLES = 1000
+PERCENTILES = (50, 95, 99)
+
+
+class TDigest:
+    """Centroids (mean, weight) sorted by mean, plus exact count / sum / min / max."""
+
+    __slots__ = ("compression", "_means", "_weights", "_buffer", "_exact", "count", "total", "min", "max")
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self._means: list[float] = []
+        self._weights: list[float] = []
+        self._buffer: list[tuple[float, float]] = []
+        # True while _buffer holds every raw sample (nothing compressed or merged in as centroids).
+        self._exact = True
+        self.count = 0.0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    @classmethod
+    def of(cls, values, weight: float = 1.0, compression: int = DEFAULT_COMPRESSION) -> "TDigest":
+        """
+        Digest of an iterable in one pass; NaN (missing sample) is skipped. Give points
+        aligned over longer periods a proportionally larger weight so digests of
+        differently aligned chunks merge into a time-weighted distribution.
+        """
+        digest = cls(compression)
+        for v in values:
+            if v == v:
+                digest.add(v, weight)
+        return digest
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.total += value * weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= self._buffer_limit():
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Fold another digest into this one (in place) and return self."""
+        if not other.count or other.min is None or other.max is None:
+            return self
+        if other._exact:
+            self._buffer.extend(other._buffer)
+        else:
+            other._compress()
+            self._buffer.extend(zip(other._means, other._weights))
+            self._exact = False
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        if len(self._buffer) >= self._buffer_limit():
+            self._compress()
+        return self
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Value at quantile q (0–1): exact while the raw samples are kept, otherwise
+        interpolated between centroid centers.
+        """
+        lo, hi = self.min, self.max
+        if not self.count or lo is None or hi is None:
+            return None
+        if self._exact:
+            return _interpolate(sorted(self._buffer), q * self.count)
+        self._compress()
+        means, weights = self._means, self._weights
+        if len(means) == 1:
+            return means[0]
+        index = q * self.count
+        if index <= weights[0] / 2:
+            return lo + (means[0] - lo) * index / (weights[0] / 2)
+        cumulative = weights[0] / 2
+        for i in range(len(means) - 1):
+            step = (weights[i] + weights[i + 1]) / 2
+            if cumulative + step >= index:
+                return means[i] + (means[i + 1] - means[i]) * (index - cumulative) / step
+            cumulative += step
+        tail = weights[-1] / 2
+        fraction = min(1.0, (index - cumulative) / tail) if tail else 1.0
+        return means[-1] + (hi - means[-1]) * fraction
+
+    def percentiles(self, pcts=PERCENTILES, digits: int = 2) -> dict[int, float | None]:
+        """{pct: rounded value} for each requested percentile."""
+        out = {}
+        for pct in pcts:
+            v = self.quantile(pct / 100)
+            out[pct] = round(v, digits) if v is not None else None
+        return out
+
+    def _scale(self, q: float) -> float:
+        """k1 scale function: centroid size bound shrinks toward the tails."""
+        return self.compression / (2 * math.pi) * math.asin(max(-1.0, min(1.0, 2 * q - 1)))
+
+    def _buffer_limit(self) -> int:
+        return EXACT_SAMPLES if self._exact else 5 * self.compression
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        self._exact = False
+        items = sorted([*zip(self._means, self._weights), *self._buffer])
+        self._buffer = []
+        total = self.count
+        means, weights = [], []
+        cur_m, cur_w = items[0]
+        done = 0.0
+        k_lower = self._scale(0.0)
+        for m, w in items[1:]:
+            if self._scale((done + cur_w + w) / total) - k_lower <= 1:
+                cur_m += (m - cur_m) * w / (cur_w + w)
+                cur_w += w
+            else:
+                means.append(cur_m)
+                weights.append(cur_w)
+                done += cur_w
+                k_lower = self._scale(done / total)
+                cur_m, cur_w = m, w
+        means.append(cur_m)
+        weights.append(cur_w)
+        self._means, self._weights = means, weights
+
+
+def _interpolate(samples: list[tuple[float, float]], index: float) -> float:
+    """Weighted quantile of sorted (value, weight) samples at cumulative weight index."""
+    cumulative = samples[0][1] / 2
+    if index <= cumulative:
+        return samples[0][0]
+    for (v, w), (v_next, w_next) in zip(samples, samples[1:]):
+        step = (w + w_next) / 2
+        if cumulative + step >= index:
+            return v + (v_next - v) * (index - cumulative) / step
+        cumulative += step
+    return samples[-1][0]
@@ -1,7 +1,28 @@
-from routes.health import health
-from routes.openapi import docs, openapi_json
-from routes.connect import connect
-from routes.chat import chat
-from routes.demo import demo_overview, demo_projects
+"""
+Route handlers, loaded lazily: `routes.chat` only imports routes/chat.py (and the
+GCP provider behind it) the first time a chat request arrives, so a cold start
+serving /api/v1/health never pays for the rest.
+"""
+from importlib import import_module
 
-__all__ = ["health", "docs", "openapi_json", "connect", "chat", "demo_overview", "demo_projects"]
+_ROUTES = {
+    "health": "routes.health",
+    "docs": "routes.openapi",
+    "openapi_json": "routes.openapi",
+    "connect": "routes.connect",
+    "chat": "routes.chat",
+    "demo_overview": "routes.demo",
+    "demo_projects": "routes.demo",
+    "stats": "routes.stats",
+}
+
+__all__ = list(_ROUTES)
+
+
+def __getattr__(name: str):
+    module = _ROUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module 'routes' has no attribute {name!r}")
+    handler = getattr(import_module(module), name)
+    globals()[name] = handler
+    return handler
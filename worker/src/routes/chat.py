@@ -11,7 +11,7 @@ from pyodide.ffi import to_js
 from workers import Response
 from services import CredentialService
 from providers import get_provider
-from utils import error, ok 
+from utils import error, ok, span
 from routes.demo import _get_demo_overview
 
 
@@ -72,7 +72,7 @@ def _build_messages(context: str, user_message: str) -> list[dict]:
     ]
 
 
-async def chat(env, request) -> Response:
+async def chat(env, request, ctx=None) -> Response:
     try:
         body = json.loads(await request.text())
     except Exception:
@@ -93,7 +93,7 @@ async def chat(env, request) -> Response:
             return error("Missing or invalid Authorization header", 401)
 
         provider_name = creds.get("provider")
-        provider = get_provider(provider_name, creds.get("credentials") or {})
+        provider = get_provider(provider_name, creds.get("credentials") or {}, env=env, ctx=ctx)
         if provider is None:
             return error(f"Unknown provider: {provider_name}", 400)
 
@@ -111,7 +111,8 @@ async def chat(env, request) -> Response:
 
     try:
         options = to_js({"messages": messages}, dict_converter=js.Object.fromEntries)
-        result = await ai.run("@cf/meta/llama-3.1-8b-instruct-fp8", options)
+        with span("ai"):
+            result = await ai.run("@cf/meta/llama-3.1-8b-instruct-fp8", options)
     except Exception as e:
         return error(f"AI error: {e}", 502)
 
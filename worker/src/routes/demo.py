@@ -4,7 +4,7 @@ Demo routes for the try-it-out flow. No authentication required.
 GET  /api/v1/demo/projects  — two mock projects
 GET  /api/v1/demo/overview  — mock overview (supports ?project= filter)
 """
-from utils import ok
+from utils import StaticJSON
 from workers import Response
 
 
@@ -236,6 +236,14 @@ DEMO_OVERVIEW_ALL = {
 }
 
 
+_PROJECTS_PAYLOAD = StaticJSON(DEMO_PROJECTS)
+_OVERVIEW_PAYLOADS = {
+    "demo-project-prod": StaticJSON(DEMO_OVERVIEW),
+    "demo-project-staging": StaticJSON(DEMO_OVERVIEW_STAGING),
+}
+_OVERVIEW_ALL_PAYLOAD = StaticJSON(DEMO_OVERVIEW_ALL)
+
+
 def _get_demo_overview(project_id: str | None = None) -> dict:
     if project_id == "demo-project-staging":
         return DEMO_OVERVIEW_STAGING
@@ -244,12 +252,12 @@ def _get_demo_overview(project_id: str | None = None) -> dict:
     return DEMO_OVERVIEW_ALL
 
 
-async def demo_projects() -> Response:
-    return ok(DEMO_PROJECTS)
+async def demo_projects(request) -> Response:
+    return _PROJECTS_PAYLOAD.response(request)
 
 
 async def demo_overview(request) -> Response:
     from urllib.parse import parse_qs, urlparse
     query = parse_qs(urlparse(request.url).query)
     project_id = query.get("project", [None])[0] if query.get("project") else None
-    return ok(_get_demo_overview(project_id))
+    return _OVERVIEW_PAYLOADS.get(project_id, _OVERVIEW_ALL_PAYLOAD).response(request)
@@ -1,6 +1,6 @@
-import json
 from workers import Response
 from docs import OPENAPI_SPEC
+from utils import StaticJSON
 
 
 SWAGGER_HTML = """<!DOCTYPE html>
@@ -32,14 +32,12 @@ SWAGGER_HTML = """<!DOCTYPE html>
 </body>
 </html>"""
 
+_OPENAPI_PAYLOAD = StaticJSON(OPENAPI_SPEC)
+
 
 async def docs() -> Response:
     return Response(SWAGGER_HTML, status=200, headers={"Content-Type": "text/html"})
 
 
-async def openapi_json() -> Response:
-    return Response(
-        json.dumps(OPENAPI_SPEC),
-        status=200,
-        headers={"Content-Type": "application/json"},
-    )
+async def openapi_json(request) -> Response:
+    return _OPENAPI_PAYLOAD.response(request)
@@ -0,0 +1,17 @@
+"""
+GET /api/v1/_stats — isolate-level operational stats (admin only).
+
+Requires X-Admin-Token matching the ADMIN_TOKEN secret. Returns per-route and
+per-span latency histograms, cache hit rates, bytes transferred and event
+counters (token mints, cache / store write errors, …) since this isolate started.
+There is no retry counter: upstream calls are not retried (an API error is
+raised to the caller on the first attempt), so there is nothing to count.
+"""
+from workers import Response
+from utils import error, ok, is_admin, STATS
+
+
+async def stats(env, request) -> Response:
+    if not is_admin(env, request):
+        return error("Missing or invalid admin token", 401)
+    return ok(STATS.snapshot())
@@ -1,4 +1,6 @@
 from services.crypto_service import CryptoService
 from services.credential_service import CredentialService
+from services.metrics_store import MetricsStore
+from services.cache_service import CacheService
 
-__all__ = ["CryptoService", "CredentialService"]
+__all__ = ["CryptoService", "CredentialService", "MetricsStore", "CacheService"]
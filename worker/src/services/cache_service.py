@@ -0,0 +1,62 @@
+import asyncio
+import json
+from utils.stats import STATS
+from utils.timing import span
+
+
+class CacheService:
+    """
+    JSON values in the optional env.CACHE KV namespace, with per-layer hit/miss stats,
+    plus background work that outlives the response via ctx.waitUntil.
+
+    Without the binding the cache is disabled (get → None, put → no-op), so callers
+    simply fall through to the source.
+    """
+
+    def __init__(self, env, ctx=None):
+        self._kv = getattr(env, "CACHE", None) if env is not None else None
+        self._ctx = ctx
+
+    @property
+    def enabled(self) -> bool:
+        return self._kv is not None
+
+    async def get(self, key: str, layer: str) -> dict | None:
+        if self._kv is None:
+            return None
+        with span("cache"):
+            raw = await self._kv.get(key)
+        value = None
+        if raw:
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                value = None
+        STATS.record_cache(layer, hit=value is not None)
+        return value
+
+    async def put(self, key: str, value: dict, ttl: int | None = None) -> None:
+        """Best effort: a failed write is counted, never raised."""
+        if self._kv is None:
+            return
+        try:
+            with span("cache"):
+                if ttl:
+                    await self._kv.put(key, json.dumps(value, separators=(",", ":")), expirationTtl=ttl)
+                else:
+                    await self._kv.put(key, json.dumps(value, separators=(",", ":")))
+        except Exception:
+            STATS.incr("cache_write_errors")
+
+    def defer(self, coro) -> None:
+        """Run coro after the response is sent (ctx.waitUntil); without a ctx, schedule it on the loop."""
+        task = asyncio.ensure_future(_quietly(coro))
+        if self._ctx is not None:
+            self._ctx.waitUntil(task)
+
+
+async def _quietly(coro) -> None:
+    try:
+        await coro
+    except Exception:
+        STATS.incr("background_errors")
@@ -1,5 +1,6 @@
 import json
 from services.crypto_service import CryptoService
+from utils.timing import span
 
 
 class CredentialService:
@@ -23,16 +24,17 @@ class CredentialService:
         if not connection_id:
             return None
 
-        raw = await self._kv.get(connection_id)
-        if not raw:
-            return None
-
-        try:
-            encrypted = json.loads(raw)
-            plaintext = await self._crypto.decrypt(encrypted)
-            return json.loads(plaintext)
-        except Exception:
-            return None
+        with span("credentials"):
+            raw = await self._kv.get(connection_id)
+            if not raw:
+                return None
+
+            try:
+                encrypted = json.loads(raw)
+                plaintext = await self._crypto.decrypt(encrypted)
+                return json.loads(plaintext)
+            except Exception:
+                return None
 
     @staticmethod
     def _extract_connection_id(request) -> str | None:
@@ -0,0 +1,127 @@
+import asyncio
+import base64
+import json
+import sys
+from array import array
+
+from utils.stats import STATS
+from utils.timing import span
+
+# Values are utilization percents rounded to 2 decimals: stored exactly as int32 hundredths.
+_SCALE = 100
+_GAP = -(2**31)
+
+
+class MetricsStore:
+    """
+    Per-series hourly metric aggregates in KV, sharded per (project, metric family).
+
+    A manifest value {"watermark": <epoch s>, "shards": n} points at n shard values, each
+    holding up to SERIES_PER_SHARD series: {"watermark": …, "slots": {slot: {series key:
+    [first hour, base64 int32 hundredths]}}}. Points sit on hour boundaries, so a series
+    is one packed array from its first hour (missing hours are a gap marker) — ~4 bytes per
+    point instead of ~25 as JSON pairs, and a shard stays well under KV's 25 MiB value limit.
+
+    The watermark is the hour boundary the data is complete up to; callers fetch only
+    [watermark, now] from the provider and write the merged result back. A shard whose
+    watermark differs from the manifest's (a concurrent writer got in between) makes the
+    whole read a miss, so a watermark never covers data that is not there. Needs the optional
+    env.METRICS_STORE KV binding — without it the store is disabled and callers fetch everything.
+    """
+
+    PREFIX = "metrics:v2"
+    SERIES_PER_SHARD = 1000
+    # Values expire if a project's family is not refreshed for this long (also clears shards
+    # left over after the series count shrinks).
+    TTL_SECONDS = 35 * 86400
+
+    def __init__(self, env):
+        self._kv = getattr(env, "METRICS_STORE", None) if env is not None else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._kv is not None
+
+    async def get(self, project_id: str, family: str) -> dict | None:
+        """{"watermark": int | None, "slots": {slot: {key: (times, values)}}}, or None on a miss."""
+        key = self._key(project_id, family)
+        with span("metrics-store"):
+            manifest = _loads(await self._kv.get(key))
+            shards = []
+            if manifest:
+                shards = await asyncio.gather(*(self._kv.get(f"{key}:{i}") for i in range(manifest.get("shards", 0))))
+        shards = [_loads(raw) for raw in shards]
+        hit = bool(manifest) and all(s and s.get("watermark") == manifest.get("watermark") for s in shards)
+        STATS.record_cache("metrics-store", hit=hit)
+        if not hit:
+            return None
+        slots: dict[str, dict] = {}
+        for shard in shards:
+            for slot, by_key in shard.get("slots", {}).items():
+                merged = slots.setdefault(slot, {})
+                for series_key, (first_hour, packed) in by_key.items():
+                    merged[series_key] = _unpack(first_hour, packed)
+        return {"watermark": manifest.get("watermark"), "slots": slots}
+
+    async def put(self, project_id: str, family: str, watermark: int | None, slots: dict[str, dict]) -> None:
+        """
+        Write back merged aggregates ({slot: {key: (times, values)}}): shards first, then the
+        manifest. Best effort: KV allows ~1 write/s per key, last writer wins.
+        """
+        series_keys = sorted({k for by_key in slots.values() for k in by_key})
+        shards = []
+        for i in range(0, len(series_keys), self.SERIES_PER_SHARD):
+            chunk = series_keys[i:i + self.SERIES_PER_SHARD]
+            shards.append({
+                "watermark": watermark,
+                "slots": {
+                    slot: {k: _pack(*by_key[k]) for k in chunk if k in by_key and len(by_key[k][0])}
+                    for slot, by_key in slots.items()
+                },
+            })
+        key = self._key(project_id, family)
+        try:
+            with span("metrics-store"):
+                await asyncio.gather(*(self._put(f"{key}:{i}", shard) for i, shard in enumerate(shards)))
+                await self._put(key, {"watermark": watermark, "shards": len(shards)})
+        except Exception:
+            STATS.incr("metrics_store_write_errors")
+
+    async def _put(self, key: str, value: dict) -> None:
+        await self._kv.put(key, json.dumps(value, separators=(",", ":")), expirationTtl=self.TTL_SECONDS)
+
+    def _key(self, project_id: str, family: str) -> str:
+        return f"{self.PREFIX}:{project_id}:{family}"
+
+
+def _loads(raw) -> dict | None:
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def _pack(times: array, values: array) -> list:
+    """[first hour, base64 int32 hundredths per hour from it, _GAP where there is no point]."""
+    first = times[0] // 3600
+    packed = array("i", [_GAP]) * (times[-1] // 3600 - first + 1)
+    for t, v in zip(times, values):
+        packed[t // 3600 - first] = round(v * _SCALE)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return [first, base64.b64encode(packed.tobytes()).decode("ascii")]
+
+
+def _unpack(first_hour: int, encoded: str) -> tuple[array, array]:
+    packed = array("i")
+    packed.frombytes(base64.b64decode(encoded))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    times, values = array("q"), array("d")
+    for i, v in enumerate(packed):
+        if v != _GAP:
+            times.append((first_hour + i) * 3600)
+            values.append(v / _SCALE)
+    return times, values
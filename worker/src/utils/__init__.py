@@ -1,3 +1,6 @@
-from utils.responses import error, ok
+from utils.responses import error, ok, StaticJSON
+from utils.timing import RequestTimer, span
+from utils.stats import STATS
+from utils.admin import is_admin
 
-__all__ = ["error", "ok"]
+__all__ = ["error", "ok", "StaticJSON", "RequestTimer", "span", "STATS", "is_admin"]
@@ -0,0 +1,12 @@
+import hmac
+
+ADMIN_HEADER = "X-Admin-Token"
+
+
+def is_admin(env, request) -> bool:
+    """True if the request carries X-Admin-Token matching env.ADMIN_TOKEN (never true when the secret is unset)."""
+    expected = getattr(env, "ADMIN_TOKEN", None)
+    if not expected:
+        return False
+    given = request.headers.get(ADMIN_HEADER) or ""
+    return hmac.compare_digest(given.encode(), str(expected).encode())
@@ -0,0 +1,134 @@
+"""
+Opt-in cProfile hook for the request handler.
+
+Two ways to turn it on, neither needs a redeploy of code:
+- Header: X-Profile: <N> plus a valid X-Admin-Token → this request is profiled,
+  the top-N functions by cumulative cost are logged and returned in an
+  X-Profile response header.
+- Sampling: env.PROFILE_SAMPLE_RATE (0–1) → that fraction of all requests is
+  profiled and logged only (nothing is added to the response).
+
+cProfile hooks the whole interpreter, so while a request is profiled any other
+request interleaving on the same isolate shows up in its numbers too.
+
+Cost is counted in profiler events, not milliseconds. cProfile's default clock is
+perf_counter, and on Workers that clock only advances across I/O, so pure-Python
+work (JSON decoding, sketches, joins) would read ~0 ms and the ranking would just
+mirror which functions awaited a fetch. Instead the profiler runs on _EventClock,
+which ticks once per call / return: a function's cumulative cost is the number of
+calls made under it — deterministic, and comparable between runs. Real CPU time
+per request is in the Workers dashboard (CPU time), not here. Whether a given
+runtime freezes the clock (production vs `wrangler dev`) shows in the cold_start
+log: an import_ms of ~0 means it does (see entry.py).
+"""
+import json
+import random
+
+from utils.admin import is_admin
+
+PROFILE_HEADER = "X-Profile"
+DEFAULT_TOP_N = 25
+MAX_TOP_N = 100
+HEADER_TOP_N = 15
+
+
+def profile_settings(env, request) -> tuple[int, bool] | None:
+    """Return (top_n, expose_in_response) if this request should be profiled, else None."""
+    requested = request.headers.get(PROFILE_HEADER)
+    if requested is not None and is_admin(env, request):
+        try:
+            top_n = int(requested)
+        except ValueError:
+            top_n = DEFAULT_TOP_N
+        return max(1, min(MAX_TOP_N, top_n)), True
+    try:
+        rate = float(getattr(env, "PROFILE_SAMPLE_RATE", None) or 0)
+    except (TypeError, ValueError):
+        rate = 0.0
+    if rate > 0 and random.random() < rate:
+        return DEFAULT_TOP_N, False
+    return None
+
+
+class _EventClock:
+    """Profiler timer that advances by one each time cProfile reads it (every call and return)."""
+
+    def __init__(self):
+        self.ticks = 0
+
+    def __call__(self) -> int:
+        self.ticks += 1
+        return self.ticks
+
+
+# Only one profiler can be active per interpreter (on 3.12+ a second enable() raises), so a
+# request that overlaps a profiled one on the same isolate just runs unprofiled.
+_active = False
+
+
+async def run_profiled(awaitable, top_n: int):
+    """
+    Await under cProfile. Returns (result, rows) where rows are the top-N functions by cumulative
+    cost; rows is [] when the awaitable ran unprofiled (cProfile missing or already in use).
+    """
+    global _active
+    try:
+        import cProfile
+    except ImportError:
+        return await awaitable, []
+    if _active:
+        return await awaitable, []
+
+    profiler = cProfile.Profile(_EventClock(), 1.0)
+    try:
+        profiler.enable()
+    except ValueError:  # another profiling tool holds sys.monitoring
+        return await awaitable, []
+    _active = True
+    try:
+        result = await awaitable
+    finally:
+        profiler.disable()
+        _active = False
+    return result, top_functions(profiler, top_n)
+
+
+def top_functions(profiler, top_n: int) -> list[dict]:
+    import pstats
+
+    # {(file, line, func): (cc, ncalls, tottime, cumtime, callers)}, times in _EventClock ticks.
+    entries = pstats.Stats(profiler).stats
+    ranked = sorted(entries.items(), key=lambda kv: (kv[1][3], kv[1][1]), reverse=True)[:top_n]
+    return [
+        {
+            "function": func,
+            "location": f"{_short_path(filename)}:{line}" if line else "",
+            "calls": ncalls,
+            "own_events": int(tottime),
+            "cum_events": int(cumtime),
+        }
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in ranked
+    ]
+
+
+def log_profile(method: str, path: str, rows: list[dict]) -> None:
+    print(json.dumps({"event": "profile", "method": method, "path": path, "top": rows}))
+
+
+def profile_header(rows: list[dict]) -> str:
+    """Compact header value: `name;cum=1234;own=56;calls=4, …` for the top entries (costs in events)."""
+    return ", ".join(
+        f"{_token(r['function'])};cum={r['cum_events']};own={r['own_events']};calls={r['calls']}"
+        for r in rows[:HEADER_TOP_N]
+    )
+
+
+def _token(name: str) -> str:
+    """Make a function name safe for a header list item (no spaces, commas, or semicolons)."""
+    return "".join(c if c.isalnum() or c in "._<>-" else "_" for c in name)
+
+
+def _short_path(filename: str) -> str:
+    """Trim absolute paths down to the module-relative tail (e.g. providers/gcp/overview.py)."""
+    parts = filename.replace("\\", "/").split("/")
+    return "/".join(parts[-3:])
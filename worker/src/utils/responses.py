@@ -1,3 +1,4 @@
+import hashlib
 import json
 from workers import Response
 
@@ -16,3 +17,31 @@ def ok(data: dict, status: int = 200) -> Response:
         status=status,
         headers={"Content-Type": "application/json"},
     )
+
+
+class StaticJSON:
+    """
+    A JSON payload that never changes for the life of the isolate (OpenAPI spec,
+    demo data). Serialized once on first hit; every response after that reuses
+    the same body and a content-hash ETag, and If-None-Match gets a bodyless 304.
+    """
+
+    def __init__(self, data, *, max_age: int = 86400):
+        self._data = data
+        self._cache_control = f"public, max-age={max_age}"
+        self._body: str | None = None
+        self._etag: str | None = None
+
+    def _serialize(self) -> None:
+        body = json.dumps(self._data, separators=(",", ":"))
+        self._etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+        self._body = body
+
+    def response(self, request) -> Response:
+        if self._body is None:
+            self._serialize()
+        headers = {"ETag": self._etag, "Cache-Control": self._cache_control}
+        if_none_match = request.headers.get("If-None-Match") or ""
+        if self._etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            return Response(None, status=304, headers=headers)
+        return Response(self._body, status=200, headers={**headers, "Content-Type": "application/json"})
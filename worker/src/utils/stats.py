@@ -0,0 +1,190 @@
+"""
+Isolate-level operational stats — rolling counters and latency histograms.
+
+Everything here lives in module state, so numbers are per isolate and reset on
+cold start. GET /api/v1/_stats returns a snapshot; if the STATS_ANALYTICS
+Analytics Engine binding is configured, on_fetch also writes one data point per
+request so numbers can be aggregated across isolates.
+"""
+import math
+import time
+
+# Log-linear buckets: 16 sub-buckets per power of two → ~4.4% relative error.
+SUB_BUCKETS = 16
+MIN_VALUE_MS = 0.01
+
+
+class LatencyHistogram:
+    """HDR-style histogram over milliseconds. Bounded memory, mergeable, cheap to record."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+        self._buckets: dict[int, int] = {}
+
+    def record(self, ms: float) -> None:
+        ms = max(ms, MIN_VALUE_MS)
+        idx = math.floor(math.log2(ms) * SUB_BUCKETS)
+        self._buckets[idx] = self._buckets.get(idx, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for idx, n in other._buckets.items():
+            self._buckets[idx] = self._buckets.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, pct: float) -> float | None:
+        """Upper bound of the bucket holding the pct-th percentile (clamped to the observed max)."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * pct / 100)
+        seen = 0
+        for idx in sorted(self._buckets):
+            seen += self._buckets[idx]
+            if seen >= rank:
+                return min(2 ** ((idx + 1) / SUB_BUCKETS), self.max or 0)
+        return self.max
+
+    def to_dict(self) -> dict:
+        def r(v):
+            return round(v, 1) if v is not None else None
+
+        return {
+            "count": self.count,
+            "mean_ms": r(self.total / self.count) if self.count else None,
+            "min_ms": r(self.min),
+            "p50_ms": r(self.percentile(50)),
+            "p90_ms": r(self.percentile(90)),
+            "p99_ms": r(self.percentile(99)),
+            "max_ms": r(self.max),
+        }
+
+
+class Stats:
+    """Counters for routes, timing spans (upstream APIs), cache layers, and events (token mints, write errors…)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests = 0
+        self._routes: dict[str, dict] = {}
+        self._spans: dict[str, dict] = {}
+        self._caches: dict[str, dict[str, int]] = {}
+        self._counters: dict[str, int] = {}
+
+    def record_request(self, route: str, status: int, ms: float) -> None:
+        self.requests += 1
+        entry = self._routes.setdefault(route, {"count": 0, "errors": 0, "latency": LatencyHistogram()})
+        entry["count"] += 1
+        if status >= 500:
+            entry["errors"] += 1
+        entry["latency"].record(ms)
+
+    def record_span(self, name: str, ms: float, *, ok: bool = True) -> None:
+        entry = self._span(name)
+        entry["count"] += 1
+        if not ok:
+            entry["errors"] += 1
+        entry["latency"].record(ms)
+
+    def record_bytes(self, name: str, n: int | None) -> None:
+        """Add a response body size to a span; None (size unknown) is counted under "unsized" instead."""
+        entry = self._span(name)
+        if n is None:
+            entry["unsized"] += 1
+        else:
+            entry["bytes"] += n
+
+    def record_cache(self, layer: str, hit: bool) -> None:
+        entry = self._caches.setdefault(layer, {"hit": 0, "miss": 0})
+        entry["hit" if hit else "miss"] += 1
+
+    def incr(self, counter: str, n: int = 1) -> None:
+        self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def snapshot(self) -> dict:
+        caches = {}
+        for layer, c in self._caches.items():
+            total = c["hit"] + c["miss"]
+            caches[layer] = {**c, "hit_rate": round(c["hit"] / total, 3) if total else None}
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests": self.requests,
+            "routes": {
+                route: {"count": e["count"], "errors": e["errors"], "latency": e["latency"].to_dict()}
+                for route, e in sorted(self._routes.items())
+            },
+            "spans": {
+                name: {
+                    "count": e["count"],
+                    "errors": e["errors"],
+                    "bytes": e["bytes"],
+                    "unsized": e["unsized"],
+                    "latency": e["latency"].to_dict(),
+                }
+                for name, e in sorted(self._spans.items())
+            },
+            "caches": caches,
+            "counters": dict(sorted(self._counters.items())),
+        }
+
+    def _span(self, name: str) -> dict:
+        return self._spans.setdefault(
+            name, {"count": 0, "errors": 0, "bytes": 0, "unsized": 0, "latency": LatencyHistogram()}
+        )
+
+
+STATS = Stats()
+
+# Analytics Engine column layout: double1 = total ms, double2 = status, then one fixed slot per
+# known span holding its wall-clock ms (0 when the request had none), so doubleN means the same thing on every row.
+# At most 20 doubles per data point; spans not listed here are only in the log line / _stats.
+ANALYTICS_SPANS = (
+    "monitoring",        # double3
+    "compute",           # double4
+    "bigquery",          # double5
+    "cloud-billing",     # double6
+    "gke",               # double7
+    "cloud-run",         # double8
+    "cloud-sql",         # double9
+    "storage",           # double10
+    "cloud-functions",   # double11
+    "recommender",       # double12
+    "gcp-token",         # double13
+    "credentials",       # double14
+    "resource-manager",  # double15
+    "cache",             # double16
+    "metrics-store",     # double17
+    "overview-join",     # double18
+    "overview-build",    # double19
+    "ai",                # double20
+)
+
+
+def write_analytics(env, route: str, status: int, timer) -> None:
+    """Write one Analytics Engine data point for this request, if the STATS_ANALYTICS binding exists."""
+    dataset = getattr(env, "STATS_ANALYTICS", None)
+    if dataset is None:
+        return
+    import js
+    from pyodide.ffi import to_js
+
+    spans = timer.spans()
+    point = {
+        "indexes": [route],
+        "blobs": [route, timer.method, str(status), ",".join(spans)],
+        "doubles": [timer.total_ms, status, *(spans[name]["ms"] if name in spans else 0 for name in ANALYTICS_SPANS)],
+    }
+    try:
+        dataset.writeDataPoint(to_js(point, dict_converter=js.Object.fromEntries))
+    except Exception:
+        STATS.incr("analytics_write_errors")
@@ -0,0 +1,123 @@
+"""
+Per-request latency spans.
+
+on_fetch starts a RequestTimer for every request; code anywhere below it wraps
+upstream work in `with span("name"):`. Spans with the same name are merged
+into one entry (e.g. 8 Monitoring calls → "monitoring" with count=8) whose
+duration is wall-clock time: the union of their intervals, so 8 concurrent
+500 ms calls read ~500 ms, not 4000. The summed duration is kept next to it
+(sum_ms) as a measure of upstream load. When the
+request finishes the spans are emitted as a Server-Timing header (visible in
+browser devtools) and as one structured JSON log line (visible in Workers logs).
+"""
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils.stats import STATS
+
+_current: ContextVar["RequestTimer | None"] = ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Collects named spans (milliseconds) for a single request."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.status: int | None = None
+        self._start = time.perf_counter()
+        self._total_ms: float | None = None
+        self._spans: dict[str, list[tuple[float, float]]] = {}  # name -> [(start, end) perf_counter seconds]
+        self._token = None
+
+    @classmethod
+    def start(cls, method: str, path: str) -> "RequestTimer":
+        """Create a timer and make it the current one for this request's context."""
+        timer = cls(method, path)
+        timer._token = _current.set(timer)
+        return timer
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """Add one span of name, as perf_counter() readings taken when it started and ended."""
+        self._spans.setdefault(name, []).append((start, end))
+
+    def finish(self, status: int) -> None:
+        """Stop the clock, write the log line, and detach from the request context."""
+        self.status = status
+        self._total_ms = (time.perf_counter() - self._start) * 1000
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        print(json.dumps(self.to_log()))
+
+    @property
+    def total_ms(self) -> float:
+        if self._total_ms is not None:
+            return self._total_ms
+        return (time.perf_counter() - self._start) * 1000
+
+    def spans(self) -> dict[str, dict]:
+        """{name: {"ms": wall-clock ms, "sum_ms": summed ms, "count"}}."""
+        return {
+            name: {"ms": round(wall, 1), "sum_ms": round(total, 1), "count": count}
+            for name, (wall, total, count) in self._durations().items()
+        }
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value, e.g.
+        `monitoring;dur=812.4;desc="8 calls, 3120.5ms summed", total;dur=1203.9` (dur is wall-clock).
+        """
+        parts = []
+        for name, (wall, total, count) in self._durations().items():
+            desc = f';desc="{count} calls, {total:.1f}ms summed"' if count > 1 else ""
+            parts.append(f"{name};dur={wall:.1f}{desc}")
+        parts.append(f"total;dur={self.total_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_log(self) -> dict:
+        return {
+            "event": "request",
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "total_ms": round(self.total_ms, 1),
+            "spans": self.spans(),
+        }
+
+    def _durations(self) -> dict[str, tuple[float, float, int]]:
+        """name -> (wall-clock ms of the union of its intervals, summed ms, count)."""
+        out = {}
+        for name, intervals in self._spans.items():
+            wall = total = 0.0
+            covered_to = None
+            for start, end in sorted(intervals):
+                total += end - start
+                if covered_to is None or start >= covered_to:
+                    wall += end - start
+                    covered_to = end
+                elif end > covered_to:
+                    wall += end - covered_to
+                    covered_to = end
+            out[name] = (wall * 1000, total * 1000, len(intervals))
+        return out
+
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block into the current request's timer and the isolate-level stats."""
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except Exception:
+        ok = False
+        raise
+    finally:
+        end = time.perf_counter()
+        STATS.record_span(name, (end - start) * 1000, ok=ok)
+        timer = _current.get()
+        if timer is not None:
+            timer.record(name, start, end)
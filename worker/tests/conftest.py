@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import worker modules the way the runtime does: from src/ as top-level packages.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
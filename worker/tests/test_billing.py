@@ -0,0 +1,21 @@
+import asyncio
+
+from providers.gcp import billing
+
+
+def test_multi_project_export_lives_in_the_connection_project(monkeypatch):
+    async def account_info(project_id, token, cache=None):
+        return {"billing_account_id": "ACCOUNT"}
+
+    queried = []
+
+    async def cached_bigquery(cache, project_id, dataset_id, account, token, detailed, project_ids):
+        queried.append(project_id)
+        return {pid: {"top_services": [], "resource_costs": []} for pid in project_ids}
+
+    monkeypatch.setattr(billing, "_billing_account_info", account_info)
+    monkeypatch.setattr(billing, "_cached_bigquery", cached_bigquery)
+    asyncio.run(billing.get_projects_billing_info(
+        ["alpha", "beta"], "token", connection_project_id="home", credentials={"billing_export_dataset": "ds"}
+    ))
+    assert queried == ["home"]
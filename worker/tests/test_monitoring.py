@@ -0,0 +1,88 @@
+import asyncio
+from array import array
+
+from providers.gcp import monitoring
+from providers.gcp.series import epoch_seconds
+
+
+def _cpu(t: int) -> float:
+    """Quiet 5–7 % with one 90 % sample every 50 periods."""
+    step = t // 3600
+    return 90.0 if step % 50 == 0 else 5.0 + step % 3
+
+
+class FakeMonitoring:
+    """Stands in for _fetch_series: one VM, points every `period` seconds over [start, end]."""
+
+    def __init__(self):
+        self.calls = []
+        self.aligned = {"cpu": [], "memory": []}
+
+    async def __call__(self, project_id, family, query, start_time, end_time, period, token, id_filter=None):
+        self.calls.append((query, period))
+        start, end = epoch_seconds(start_time), epoch_seconds(end_time)
+        times = array("q", range(start + period, end + 1, period))
+        kind = query[0]
+        values = array("d", (_cpu(t) if kind == "cpu" else 40.0 for t in times))
+        if query[3]:  # whole window: the aligner already reduced the chunk to one point
+            hourly = range(start + 3600, end + 1, 3600)
+            values = array("d", [max(_cpu(t) if kind == "cpu" else 40.0 for t in hourly)])
+        else:
+            self.aligned[kind].extend((v, period) for v in values)
+        return {"us-central1-a/1": (times, values)}
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    rank = q * (len(ordered) - 1)
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _collect(monkeypatch, days, resolution="summary"):
+    fake = FakeMonitoring()
+    monkeypatch.setattr(monitoring, "_fetch_series", fake)
+    items = asyncio.run(monitoring.collect_metrics("p", "token", ["vm"], days, resolution))
+    return items, fake
+
+
+def _weighted_mean(pairs):
+    return sum(v * period for v, period in pairs) / sum(period for _, period in pairs)
+
+
+def test_summary_has_percentiles_without_a_store(monkeypatch):
+    items, fake = _collect(monkeypatch, 30)
+    [item] = items
+    summary = item["summary"]
+    assert summary["p95_cpu_percent"] is not None
+    assert summary["p99_ram_percent"] == 40.0
+    assert summary["peak_cpu_percent"] == 90.0
+    # Means are aligned coarsely, never hourly.
+    assert all(period == monitoring.SUMMARY_PERIOD for query, period in fake.calls if not query[3])
+
+
+def test_summary_percentiles_match_the_aligned_means(monkeypatch):
+    items, fake = _collect(monkeypatch, 30)
+    cpu = [v for v, _ in fake.aligned["cpu"]]
+    summary = items[0]["summary"]
+    for pct in (50, 95, 99):
+        assert abs(summary[f"p{pct}_cpu_percent"] - _exact(cpu, pct / 100)) < 0.05
+    assert abs(summary["avg_cpu_percent"] - sum(cpu) / len(cpu)) < 0.01
+
+
+def test_summary_merges_chunk_sketches(monkeypatch):
+    items, fake = _collect(monkeypatch, 90)
+    summary = items[0]["summary"]
+    assert summary["p95_cpu_percent"] is not None
+    assert abs(summary["avg_cpu_percent"] - _weighted_mean(fake.aligned["cpu"])) < 0.01
+
+
+def test_full_series_weights_coarser_chunks_by_period(monkeypatch):
+    items, fake = _collect(monkeypatch, 60, "full")
+    series = items[0]["series"]
+    periods = {period for _, period in fake.aligned["cpu"]}
+    assert periods == {3600, monitoring.OLDER_CHUNK_PERIOD}
+    assert abs(series.avg("cpu") - _weighted_mean(fake.aligned["cpu"])) < 0.01
+    # Older 6-hour points count six times: the sketch's total weight is hours covered.
+    assert series.sketch("cpu").count == sum(period / 3600 for _, period in fake.aligned["cpu"])
@@ -0,0 +1,38 @@
+from providers.gcp.overview import _flag_idle, _recommend_resize
+
+
+def _vm():
+    return {"resource_type": "vm", "vm_status": "RUNNING", "machine_type": "n2-standard-8", "region": "us-central1"}
+
+
+def test_resize_needs_a_percentile_or_peak():
+    entry = _vm()
+    _recommend_resize(entry, {"avg_cpu_percent": 3.0, "avg_ram_percent": 10.0})
+    assert "recommended_action" not in entry
+
+
+def test_resize_labels_the_metric_it_used():
+    entry = _vm()
+    _recommend_resize(entry, {"p95_cpu_percent": 6.0, "avg_cpu_percent": 3.0, "peak_ram_percent": 12.0})
+    assert "(p95 CPU 6.0%, peak RAM 12.0%)" in entry["recommended_action"]
+
+    entry = _vm()
+    _recommend_resize(entry, {"peak_cpu_percent": 9.0, "avg_cpu_percent": 3.0})
+    assert "(peak CPU 9.0%)" in entry["recommended_action"]
+
+
+def test_idle_needs_a_percentile_or_peak():
+    entry = _vm()
+    _flag_idle(entry, {"avg_cpu_percent": 0.5})
+    assert "waste_reason" not in entry
+
+    entry = _vm()
+    _flag_idle(entry, {"peak_cpu_percent": 1.5, "avg_cpu_percent": 0.5})
+    assert entry["waste_reason"] == "idle"
+    assert entry["recommended_action"].endswith("(peak CPU 1.5%)")
+
+
+def test_idle_is_judged_on_the_p95_first():
+    entry = _vm()
+    _flag_idle(entry, {"p95_cpu_percent": 1.0, "peak_cpu_percent": 40.0})
+    assert entry["recommended_action"].endswith("(p95 CPU 1.0%)")
@@ -0,0 +1,24 @@
+import asyncio
+
+from utils.profiler import run_profiled
+
+
+async def _work(delay: float) -> str:
+    await asyncio.sleep(delay)
+    return sum(range(1000)) and "done"
+
+
+def test_overlapping_profiled_requests_both_complete():
+    async def main():
+        return await asyncio.gather(run_profiled(_work(0.02), 5), run_profiled(_work(0.01), 5))
+
+    (first, first_rows), (second, second_rows) = asyncio.run(main())
+    assert first == second == "done"
+    # Only one of the two can hold the profiler; the other ran unprofiled.
+    assert bool(first_rows) != bool(second_rows)
+
+
+def test_profiler_is_released_after_a_request():
+    asyncio.run(run_profiled(_work(0), 5))
+    _, rows = asyncio.run(run_profiled(_work(0), 5))
+    assert rows
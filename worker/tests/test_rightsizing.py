@@ -0,0 +1,52 @@
+import itertools
+
+from providers.gcp.pricing import machine_catalog
+from providers.gcp.rightsizing import recommend
+
+# Predefined types as published by Compute Engine (machine family docs), per family and class.
+PUBLISHED = {
+    "e2": {"standard": (2, 4, 8, 16, 32), "highmem": (2, 4, 8, 16), "highcpu": (2, 4, 8, 16, 32)},
+    "n1": {"standard": (1, 2, 4, 8, 16, 32, 64, 96), "highmem": (2, 4, 8, 16, 32, 64, 96), "highcpu": (2, 4, 8, 16, 32, 64, 96)},
+    "n2": {
+        "standard": (2, 4, 8, 16, 32, 48, 64, 80, 96, 128),
+        "highmem": (2, 4, 8, 16, 32, 48, 64, 80, 96, 128),
+        "highcpu": (2, 4, 8, 16, 32, 48, 64, 80, 96),
+    },
+    "n2d": {
+        "standard": (2, 4, 8, 16, 32, 48, 64, 80, 96, 128, 224),
+        "highmem": (2, 4, 8, 16, 32, 48, 64, 80, 96),
+        "highcpu": (2, 4, 8, 16, 32, 48, 64, 80, 96, 128, 224),
+    },
+    "n4": {c: (2, 4, 8, 16, 32, 48, 64, 80) for c in ("standard", "highmem", "highcpu")},
+    "t2d": {"standard": (1, 2, 4, 8, 16, 32, 48, 60)},
+    "c2": {"standard": (4, 8, 16, 30, 60)},
+    "c2d": {c: (2, 4, 8, 16, 32, 56, 112) for c in ("standard", "highmem", "highcpu")},
+    "c3": {c: (4, 8, 22, 44, 88, 176) for c in ("standard", "highmem", "highcpu")},
+    "c3d": {c: (4, 8, 16, 30, 60, 90, 180, 360) for c in ("standard", "highmem", "highcpu")},
+}
+SHARED_CORE = {"e2-micro", "e2-small", "e2-medium", "f1-micro", "g1-small"}
+EXISTING = SHARED_CORE | {
+    f"{family}-{machine_class}-{vcpus}"
+    for family, classes in PUBLISHED.items()
+    for machine_class, sizes in classes.items()
+    for vcpus in sizes
+}
+
+
+def test_catalog_only_lists_existing_types():
+    listed = {t[0] for types in machine_catalog().values() for t in types}
+    assert listed - EXISTING == set()
+
+
+def test_every_recommended_type_exists():
+    levels = (1, 5, 20, 45, 70, 95)
+    for name in sorted(EXISTING - SHARED_CORE):
+        for cpu, ram in itertools.product(levels, (*levels, None)):
+            rec = recommend(name, "us-central1-a", cpu, ram)
+            if rec is not None:
+                assert rec["machine_type"] in EXISTING, (name, cpu, ram, rec)
+
+
+def test_n1_highcpu_is_not_sized_to_a_missing_type():
+    rec = recommend("n1-highcpu-4", "us-central1-a", 5, 5)
+    assert rec is not None and rec["machine_type"] != "n1-highcpu-1"
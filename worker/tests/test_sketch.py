@@ -0,0 +1,49 @@
+import random
+
+from providers.gcp.sketch import EXACT_SAMPLES, TDigest
+
+
+def exact_quantile(values, q):
+    """Linear interpolation between closest ranks (numpy's default percentile)."""
+    ordered = sorted(values)
+    rank = q * (len(ordered) - 1)
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def spiky(rng, quiet=715, spikes=5):
+    """30 days of hourly CPU: quiet at 2–4 % with a handful of 100 % spikes."""
+    values = [rng.uniform(2, 4) for _ in range(quiet)] + [100.0] * spikes
+    rng.shuffle(values)
+    return values
+
+
+def test_spiky_window_percentiles_match_exact():
+    values = spiky(random.Random(7))
+    digest = TDigest.of(values)
+    for q in (0.5, 0.95, 0.99):
+        assert abs(digest.quantile(q) - exact_quantile(values, q)) < 0.05
+
+
+def test_merged_chunks_stay_exact():
+    rng = random.Random(11)
+    chunks = [spiky(rng, quiet=179, spikes=1) for _ in range(4)]
+    digest = TDigest()
+    for chunk in chunks:
+        digest.merge(TDigest.of(chunk))
+    values = [v for chunk in chunks for v in chunk]
+    for q in (0.5, 0.95, 0.99):
+        assert abs(digest.quantile(q) - exact_quantile(values, q)) < 0.05
+
+
+def test_compressed_digest_stays_close():
+    rng = random.Random(3)
+    values = [rng.uniform(0, 100) for _ in range(20 * EXACT_SAMPLES)]
+    digest = TDigest.of(values)
+    for q in (0.5, 0.95, 0.99):
+        assert abs(digest.quantile(q) - exact_quantile(values, q)) < 1.0
+
+
+def test_empty_digest_has_no_percentiles():
+    assert TDigest().percentiles() == {50: None, 95: None, 99: None}
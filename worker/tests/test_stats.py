@@ -0,0 +1,10 @@
+from utils.stats import Stats
+
+
+def test_unknown_response_size_is_not_counted_as_zero_bytes():
+    stats = Stats()
+    stats.record_bytes("monitoring", 1200)
+    stats.record_bytes("monitoring", None)
+    span = stats.snapshot()["spans"]["monitoring"]
+    assert span["bytes"] == 1200
+    assert span["unsized"] == 1